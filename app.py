@@ -21,6 +21,14 @@ except ImportError:
     print("         Install with: pip install pystray Pillow")
     HAS_PYSTRAY = False
 
+# --- DTS Probe Import (header-only metadata for /list_models) ---
+try:
+    from dts_module import dts as dts_shape
+    HAS_DTS_PROBE = True
+except ImportError as e:
+    print(f"WARNING: dts_module could not be imported ({e}). /list_models will fall back to guessed textures.")
+    HAS_DTS_PROBE = False
+
 # --- Path Setup ---
 if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
     root = pathlib.Path(sys._MEIPASS) # PyInstaller temporary path
@@ -34,7 +42,7 @@ textures_dir = static_dir / "textures" # For PNGs
 model_json_dir = static_dir / "model_json" # Where pre-processed JSONs are stored
 
 # Source directories (can be used by list_models for discovery if desired, but not for on-demand export)
-# dts_source_dir = root / "tools" / "dts_files"
+dts_source_dir = root / "tools" / "dts_files" # Probed by list_models for real material names
 # interior_source_dir = root / "tools" / "interior_files"
 
 # Exporter imports are no longer needed here if we pre-process everything
@@ -73,14 +81,22 @@ def index():
 def list_models():
     # List models based on existing .json files in static/model_json/
     models = []
+    dts_sources = {}
+    if HAS_DTS_PROBE and dts_source_dir.exists():
+        dts_sources = {p.stem.lower(): p for p in dts_source_dir.iterdir() if p.suffix.lower() == ".dts"}
     if model_json_dir.exists():
         for f_path in model_json_dir.glob("*.json"):
             model_name_stem = f_path.stem
-            # Guessing texture name for DTS models can still be useful for the dropdown's default
+            # Real material names come from probing the source DTS header (no mesh parsing).
             # For DIS, the JSON itself will list all textures.
-            guessed_texture_name = TEXTURE_MAPPINGS.get(model_name_stem, model_name_stem + ".png")
+            material_textures = probe_material_textures(dts_sources.get(model_name_stem.lower()))
+            if material_textures:
+                texture_name = material_textures[0]
+            else: # No source DTS to probe, fall back to guessing
+                texture_name = TEXTURE_MAPPINGS.get(model_name_stem, model_name_stem + ".png")
             # 'type' is not strictly needed if all are JSON, but can be kept if UI uses it.
-            models.append({"model_name": model_name_stem, "texture_name": guessed_texture_name})
+            models.append({"model_name": model_name_stem, "texture_name": texture_name,
+                           "material_textures": material_textures})
     else:
         print(f"Model JSON directory not found: {model_json_dir}")
         
@@ -89,6 +105,19 @@ def list_models():
         print(f"No pre-processed .json models found in {model_json_dir}. Please run batch export scripts.")
     return jsonify(models)
 
+def probe_material_textures(dts_path):
+    """PNG names of a DTS file's non-empty material slots, read with dts.probe()."""
+    if dts_path is None:
+        return []
+    try:
+        meta = dts_shape.probe(dts_path)
+    except Exception as e:
+        print(f"Warning: Could not probe {dts_path.name}: {e}")
+        return []
+    if meta is None:
+        return []
+    return [os.path.splitext(name.strip())[0] + ".png" for name in meta.material_names if name.strip()]
+
 @app.route("/model_json/<model_name>")
 def get_model_json(model_name):
     if ".." in model_name or "/" in model_name or "\\" in model_name: abort(400)
@@ -103,6 +132,18 @@ def get_model_json(model_name):
             
     return send_from_directory(str(model_json_dir), json_filename)
 
+@app.route("/model_bin/<model_name>")
+def get_model_bin(model_name):
+    # Binary form of the same model (tools/model_bin.py), written next to the JSON by the exporters.
+    # Missing is not an error: the viewer falls back to /model_json.
+    if ".." in model_name or "/" in model_name or "\\" in model_name: abort(400)
+
+    bin_filename = model_name + ".bin"
+    if not (model_json_dir / bin_filename).exists():
+        abort(404, f"No binary model data for '{model_name}'.")
+
+    return send_from_directory(str(model_json_dir), bin_filename, mimetype="application/octet-stream")
+
 @app.route("/texture/<texture_filename>")
 def get_texture(texture_filename):
     if ".." in texture_filename or "/" in texture_filename or "\\" in texture_filename: abort(400)
@@ -1,45 +1,133 @@
 from dts_module import helper
 import struct
 from dts_module import dts_mesh
+from dts_module import dts_transforms
+from dts_module import parse_trace
 import numpy as np
+import sys
+
+# Fixed-layout records of the pre-v7 formats
+TRANSITION_STRUCT_V6 = struct.Struct('<iifffffffffffff')
+DETAIL_DTYPE = np.dtype([('root_node', '<u4'), ('size', '<f4')])
+
+# Bump whenever parsing changes what ends up in a parse_cache entry
+CACHE_VERSION = 3
+CACHED_HEADER_FIELDS = ('version', 'num_nodes', 'num_seq', 'num_sub_seq', 'num_keyframes', 'num_transforms',
+                        'num_names', 'num_objects', 'num_details', 'num_meshes', 'num_transitions',
+                        'num_frame_triggers', 'radius', 'center', 'min_bounds', 'max_bounds',
+                        'default_materials', 'always_node', 'dts_version_from_material_list_pers',
+                        'material_list_num_details')
+
+def table_dtypes(version):
+    """On-disk record layout of the node, sequence, sub-sequence, keyframe and transform tables.
+
+    Field names match the attributes of the per-row classes (dts_node, dts_sequence, ...), so the
+    tables can be indexed the same way whichever format variant (v<7, v7, v8+) they came from.
+    """
+    if version >= 8: # Kaitai: node (u2, s2, u2, u2, u2)
+        node = [('name_index', '<u2'), ('parent_node', '<i2'), ('num_sub_seq', '<u2'),
+                ('first_sub_seq', '<u2'), ('transform_index', '<u2')]
+    elif version == 7: # Kaitai: nodev7 (u4, s4, u4, u4, u4)
+        node = [('name_index', '<u4'), ('parent_node', '<i4'), ('num_sub_seq', '<u4'),
+                ('first_sub_seq', '<u4'), ('transform_index', '<u4')]
+    else: # Versions < 7: 5x s4
+        node = [('name_index', '<i4'), ('parent_node', '<i4'), ('num_sub_seq', '<i4'),
+                ('first_sub_seq', '<i4'), ('transform_index', '<i4')]
+
+    # Kaitai: vector_sequence (u4, u4, f4, u4, ...) - trigger fields for v4+, IFL fields for v5+
+    sequence = [('name_index', '<u4'), ('cyclic', '<u4'), ('duration', '<f4'), ('priority', '<u4')]
+    if version >= 4:
+        sequence += [('first_trigger_frame', '<u4'), ('num_trigger_frames', '<u4')]
+    if version >= 5:
+        sequence += [('num_ifl_subsequences', '<u4'), ('first_ifl_subsequence', '<u4')]
+
+    sub_seq_type = '<u2' if version >= 8 else ('<u4' if version == 7 else '<i4')
+    sub_sequence = [('sequence_idx', sub_seq_type), ('num_key_frames', sub_seq_type), ('first_key_frame', sub_seq_type)]
+
+    if version >= 8: # Kaitai: keyframe (f4, u2, u2)
+        keyframe = [('position', '<f4'), ('key_value', '<u2'), ('mat_index', '<u2')]
+    elif version == 7: # Kaitai: keyframev7 (f4, u4, u4)
+        keyframe = [('position', '<f4'), ('key_value', '<u4'), ('mat_index', '<u4')]
+    elif version < 3: # f4, s4 (no mat_index)
+        keyframe = [('position', '<f4'), ('key_value', '<i4')]
+    else: # Versions 3 to 6: f4, s4, s4
+        keyframe = [('position', '<f4'), ('key_value', '<i4'), ('mat_index', '<i4')]
+
+    # Quat16 (x, y, z, w as s2) + Point3f translate, plus Point3f scale up to v7
+    transform = [('rotate', '<i2', (4,)), ('translate', '<f4', (3,))]
+    if version <= 7:
+        transform += [('scale', '<f4', (3,))]
+
+    return {
+        'node': np.dtype(node),
+        'sequence': np.dtype(sequence),
+        'sub_sequence': np.dtype(sub_sequence),
+        'keyframe': np.dtype(keyframe),
+        'transform': np.dtype(transform),
+    }
+
+def decode_name(raw):
+    """Decodes a NUL-padded 24-byte names table entry to an interned, whitespace-stripped str."""
+    return sys.intern(bytes(raw).split(b'\x00')[0].decode('utf-8', 'ignore').strip())
+
+def table_record_sizes(version):
+    """Byte size of one record of each fixed-layout header table for a shape version."""
+    sizes = {name: dtype.itemsize for name, dtype in table_dtypes(version).items()}
+    sizes.update({
+        'name': 24,
+        'object': 28 if version >= 8 else (72 if version == 7 else 68),
+        'detail': DETAIL_DTYPE.itemsize,
+        'transition': 40 if version >= 8 else (48 if version == 7 else 60),
+        'frame_trigger': 8,
+    })
+    return sizes
 
 class dts_material_param:
-    def __init__(self, data, curr_data_index, material_block_version):
-        self.flags = helper.get_int(data, curr_data_index) # Kaitai: s4, assuming helper.get_int is u4, might need get_sint
-        self.alpha = helper.get_float(data, curr_data_index)
-        self.internal_index = helper.get_int(data, curr_data_index) # Kaitai: s4
+    def __init__(self, stream, material_block_version):
+        self.flags = stream.read_int() # Kaitai: s4, assuming read_int is u4, might need read_sint
+        self.alpha = stream.read_float()
+        self.internal_index = stream.read_int() # Kaitai: s4
         
-        self.rgb_r = helper.get_int8(data, curr_data_index)
-        self.rgb_g = helper.get_int8(data, curr_data_index)
-        self.rgb_b = helper.get_int8(data, curr_data_index)
-        self.rgb_flags_byte = helper.get_int8(data, curr_data_index)
+        self.rgb_r = stream.read_int8()
+        self.rgb_g = stream.read_int8()
+        self.rgb_b = stream.read_int8()
+        self.rgb_flags_byte = stream.read_int8()
 
         map_file_bytes = b''
         if material_block_version == 1:
-            map_file_bytes = data[curr_data_index[0]:curr_data_index[0] + 16]
-            curr_data_index[0] += 16
+            map_file_bytes = stream.read_bytes(16)
         elif material_block_version >= 2:
-            map_file_bytes = data[curr_data_index[0]:curr_data_index[0] + 32]
-            curr_data_index[0] += 32
+            map_file_bytes = stream.read_bytes(32)
         
-        self.map_file = map_file_bytes.split(b'\x00')[0].decode('utf-8', 'ignore')
+        self.map_file = bytes(map_file_bytes).split(b'\x00')[0].decode('utf-8', 'ignore')
 
         if material_block_version >= 3:
-            self.type = helper.get_int(data, curr_data_index) # Kaitai: s4
-            self.elasticity = helper.get_float(data, curr_data_index)
-            self.friction = helper.get_float(data, curr_data_index)
+            self.type = stream.read_int() # Kaitai: s4
+            self.elasticity = stream.read_float()
+            self.friction = stream.read_float()
         else:
             self.type = -1 
             self.elasticity = 0.0
             self.friction = 0.0
 
         if material_block_version >= 4:
-            self.use_default_props = helper.get_int(data, curr_data_index) # Kaitai: u4
+            self.use_default_props = stream.read_int() # Kaitai: u4
         else:
             self.use_default_props = 0
 
 class dts:
     def __init__(self):
+        self.node_table = None
+        self.sequence_table = None
+        self.sub_sequence_table = None
+        self.keyframe_table = None
+        self.transform_table = None
+        self.transform_matrix_stacks = {} # (transpose_rotation, dtype) -> (N,4,4) stack
+        self.world_matrix_stacks = {} # (sequence, use_last_keyframe, transpose_rotation) -> (N,4,4) stack
+        self.node_levels = None # hierarchy_levels() of the nodes, built on first use
+        self.sub_sequence_index = None # (num_nodes, num_seq) -> sub-sequence index or -1
+        self.child_offsets = None # CSR index: children of node i are child_nodes[child_offsets[i]:child_offsets[i + 1]]
+        self.child_nodes = None
         self.meshes = None
         self.always_node = None
         self.default_materials = None
@@ -49,6 +137,10 @@ class dts:
         self.details = None
         self.num_transitions = 0
         self.names = None
+        self.name_strings = None # Decoded names, see decode_name()
+        self.name_lookup = {} # Lower-cased name -> first index in names
+        self.sequence_lookup = {} # Lower-cased sequence name -> first sequence index
+        self.node_lookup = {} # Lower-cased node name -> first node index
         self.transforms = None
         self.keyframes = None
         self.sub_sequences = None
@@ -71,56 +163,56 @@ class dts:
         self.num_nodes = 0
         self.material_list = []
         self.dts_version_from_material_list_pers = -1
+        self.material_list_num_details = 0
+        self.trailing_data = b'' # Whatever follows the TS::Shape block, kept so the file can be written back as read
         return
 
-    def load_binary(self, data):
-        curr_data_index = [0] # Initialize at the very beginning, pointing to the start of the data
+    def read_header(self, stream):
+        """Reads the PERS/TS::Shape header and the table counts. Leaves the stream at the node table."""
+        if len(stream) < 4 or stream.peek_bytes(4) != b"PERS": # Check from offset 0
+            print(f"ERROR: Wrong PERS header at start of file. Index: {stream.offset}. Data len: {len(stream)}")
+            return False
 
-        if curr_data_index[0] + 4 > len(data) or data[curr_data_index[0]:curr_data_index[0] + 4] != b"PERS": # Check from offset 0
-            print(f"ERROR: Wrong PERS header at start of file. Index: {curr_data_index[0]}. Data len: {len(data)}")
-            return False # Indicate failure
-
-        curr_data_index[0] = 4 # Now advance past "PERS"
+        stream.skip(4) # Now advance past "PERS"
         
-        _ = helper.get_int(data, curr_data_index) # chunk_size of the PERS block, unused by us but needs to be read
+        _ = stream.read_int() # chunk_size of the PERS block, unused by us but needs to be read
         
-        classname_len = helper.get_uint16(data, curr_data_index)
+        classname_len = stream.read_uint16()
         actual_classname_len_to_read = (classname_len + 1) & (~1) # Padded to even boundary
-        classname_bytes = data[curr_data_index[0]:curr_data_index[0] + classname_len]
-        curr_data_index[0] += actual_classname_len_to_read
+        classname_bytes = stream.peek_bytes(classname_len)
+        stream.skip(actual_classname_len_to_read)
         
         if classname_bytes != b'TS::Shape':
-            print(f"ERROR: Not a TS::Shape. Found: {classname_bytes.decode('utf-8','ignore')}")
-            return
+            print(f"ERROR: Not a TS::Shape. Found: {bytes(classname_bytes).decode('utf-8','ignore')}")
+            return False
         
-        self.version = helper.get_int(data, curr_data_index) # u4
-        print(f"DEBUG: DTS File Version: {self.version}")
-
-        self.num_nodes = helper.get_int(data, curr_data_index)
-        self.num_seq = helper.get_int(data, curr_data_index)
-        self.num_sub_seq = helper.get_int(data, curr_data_index)
-        self.num_keyframes = helper.get_int(data, curr_data_index)
-        self.num_transforms = helper.get_int(data, curr_data_index)
-        self.num_names = helper.get_int(data, curr_data_index)
-        self.num_objects = helper.get_int(data, curr_data_index)
-        self.num_details = helper.get_int(data, curr_data_index)
-        self.num_meshes = helper.get_int(data, curr_data_index)
+        self.version = stream.read_int() # u4
+
+        self.num_nodes = stream.read_int()
+        self.num_seq = stream.read_int()
+        self.num_sub_seq = stream.read_int()
+        self.num_keyframes = stream.read_int()
+        self.num_transforms = stream.read_int()
+        self.num_names = stream.read_int()
+        self.num_objects = stream.read_int()
+        self.num_details = stream.read_int()
+        self.num_meshes = stream.read_int()
 
         # num_transitions and num_frame_triggers are read differently based on version in Kaitai
         # Kaitai: num_transitions (u4) if version >= 2
         # Kaitai: num_frametriggers (u4) if version >= 4
         # Your code reads them sequentially if version conditions met. This seems okay.
         if self.version >= 2:
-            self.num_transitions = helper.get_int(data, curr_data_index)
+            self.num_transitions = stream.read_int()
         if self.version >= 4:
-            self.num_frame_triggers = helper.get_int(data, curr_data_index)
+            self.num_frame_triggers = stream.read_int()
 
-        self.radius = helper.get_float(data, curr_data_index)
-        self.center = helper.get_float3d(data, curr_data_index)
+        self.radius = stream.read_float()
+        self.center = stream.read_float3d()
 
         if self.version >= 8: # Kaitai: bounds (box3f) if version >= 8
-            self.min_bounds = helper.get_float3d(data, curr_data_index)
-            self.max_bounds = helper.get_float3d(data, curr_data_index)
+            self.min_bounds = stream.read_float3d()
+            self.max_bounds = stream.read_float3d()
         else: # For v <= 7, bounds are not explicitly stored here or derived differently.
               # Your original logic for v <= 7:
             self.min_bounds = list(self.center) # Make mutable
@@ -131,323 +223,571 @@ class dts:
             # Let's keep your original derivation for now if not v8+
             self.min_bounds[0] -= self.radius; self.min_bounds[1] -= self.radius; self.min_bounds[2] -= self.radius;
             self.max_bounds[0] += self.radius; self.max_bounds[1] += self.radius; self.max_bounds[2] += self.radius;
+        return True
+
+    def load_binary(self, data, lazy_meshes=True, trace=None, mesh_workers=None):
+        """Parses a whole shape. Pass a parse_trace.parse_trace as `trace` to record each section.
+
+        Meshes are decoded on first access unless lazy_meshes is False; with mesh_workers > 1 they
+        are all decoded up front on that many threads, which only helps when there are a large number
+        of meshes (see mesh_list.load_all). The default decodes serially.
+        """
+        trace = trace or parse_trace.NO_TRACE
+        stream = helper.binary_reader(data) # Cursor starts at the very beginning of the data
+
+        trace.begin('header', stream)
+        header_ok = self.read_header(stream)
+        trace.end(stream, version=self.version)
+        if not header_ok:
+            trace.finish()
+            return False # Indicate failure
 
 
-        print(f"DEBUG: Before nodes. Version: {self.version}. Num_nodes: {self.num_nodes}. curr_data_index: {curr_data_index[0]}")
-        self.nodes = []
-        if self.version == 7: # Kaitai: nodev7 (u4, s4, u4, u4, u4)
-            for _ in range(self.num_nodes):
-                name_idx = helper.get_int(data, curr_data_index)          # u4
-                parent_node_idx = helper.get_sint(data, curr_data_index)  # s4
-                num_ss = helper.get_int(data, curr_data_index)            # u4
-                first_ss = helper.get_int(data, curr_data_index)          # u4
-                default_tf = helper.get_int(data, curr_data_index)        # u4
-                self.nodes.append(dts_node(name_idx, parent_node_idx, num_ss, first_ss, default_tf))
-        elif self.version >= 8: # Kaitai: node (u2, s2, u2, u2, u2)
-            for _ in range(self.num_nodes):
-                name_idx = helper.get_uint16(data, curr_data_index)       # u2
-                parent_node_idx = helper.get_int16(data, curr_data_index) # s2
-                num_ss = helper.get_uint16(data, curr_data_index)         # u2
-                first_ss = helper.get_uint16(data, curr_data_index)       # u2
-                default_tf = helper.get_uint16(data, curr_data_index)     # u2
-                self.nodes.append(dts_node(name_idx, parent_node_idx, num_ss, first_ss, default_tf))
-        else: # Versions < 7 (e.g. v2-v6, assuming they use 20 bytes like your original code)
-              # This path might need more specific version checks if formats differ significantly.
-            node_struct = 'iiiii' # 5x s4 (name, parent, num_sub_seq, first_sub_seq, default_transform)
-            node_bytesize = 20
-            for _ in range(self.num_nodes):
-                [name, parent_node, num_sub_seq, first_sub_seq, default_transform_idx] = \
-                    struct.unpack(node_struct, data[curr_data_index[0]:curr_data_index[0] + node_bytesize])
-                curr_data_index[0] += node_bytesize
-                self.nodes.append(dts_node(name, parent_node, num_sub_seq, first_sub_seq, default_transform_idx))
-        print(f"DEBUG: After nodes. Read {len(self.nodes)}. curr_data_index: {curr_data_index[0]}")
-
-
-        print(f"DEBUG: Before sequences. Num_seq: {self.num_seq}. curr_data_index: {curr_data_index[0]}")
-        self.sequences = []
-        # Kaitai: vector_sequence (u4, u4, f4, u4, u4, u4, u4, u4) - consistent across versions where it exists
-        # Your original logic for versions seems fine here.
-        for _ in range(0, self.num_seq):
-            name_idx = helper.get_int(data, curr_data_index)
-            cyclic = helper.get_int(data, curr_data_index) # u4, but often 0 or 1, so int is fine
-            duration = helper.get_float(data, curr_data_index)
-            priority = helper.get_int(data, curr_data_index)
-            first_trigger = 0; num_triggers = 0; num_ifl = 0; first_ifl = 0
-            if self.version >= 4: # Fields for v4+
-                first_trigger = helper.get_int(data, curr_data_index)
-                num_triggers = helper.get_int(data, curr_data_index)
-            if self.version >= 5: # Fields for v5+
-                num_ifl = helper.get_int(data, curr_data_index)
-                first_ifl = helper.get_int(data, curr_data_index)
-            self.sequences.append(dts_sequence(name_idx, cyclic, duration, priority, first_trigger, num_triggers, num_ifl, first_ifl))
-        print(f"DEBUG: After sequences. Read {len(self.sequences)}. curr_data_index: {curr_data_index[0]}")
-
-
-        print(f"DEBUG: Before sub_sequences. Num_sub_seq: {self.num_sub_seq}. curr_data_index: {curr_data_index[0]}")
-        self.sub_sequences = []
-        if self.version == 7: # Kaitai: subsequencev7 (u4, u4, u4)
-            for _ in range(self.num_sub_seq):
-                seq_idx = helper.get_int(data, curr_data_index)    # u4
-                num_kf = helper.get_int(data, curr_data_index)     # u4
-                first_kf = helper.get_int(data, curr_data_index)   # u4
-                self.sub_sequences.append(dts_sub_sequence(seq_idx, num_kf, first_kf))
-        elif self.version >= 8: # Kaitai: subsequence (u2, u2, u2)
-            for _ in range(self.num_sub_seq):
-                seq_idx = helper.get_uint16(data, curr_data_index) # u2
-                num_kf = helper.get_uint16(data, curr_data_index)  # u2
-                first_kf = helper.get_uint16(data, curr_data_index)# u2
-                self.sub_sequences.append(dts_sub_sequence(seq_idx, num_kf, first_kf))
-        else: # Versions < 7 (assuming 12 bytes like your original code for <=7)
-            sub_seq_struct = 'iii' # 3x s4 (sequence_idx, num_key_frames, first_key_frame)
-            ss_bytesize = 12
-            for _ in range(self.num_sub_seq):
-                [sequence_idx, num_key_frames, first_key_frame] = \
-                    struct.unpack(sub_seq_struct, data[curr_data_index[0]:curr_data_index[0] + ss_bytesize])
-                curr_data_index[0] += ss_bytesize
-                self.sub_sequences.append(dts_sub_sequence(sequence_idx, num_key_frames, first_key_frame))
-        print(f"DEBUG: After sub_sequences. Read {len(self.sub_sequences)}. curr_data_index: {curr_data_index[0]}")
-
-
-        print(f"DEBUG: Before keyframes. Num_keyframes: {self.num_keyframes}. curr_data_index: {curr_data_index[0]}")
-        self.keyframes = []
-        if self.version == 7: # Kaitai: keyframev7 (f4, u4, u4)
-            for _ in range(self.num_keyframes):
-                pos = helper.get_float(data, curr_data_index)   # f4
-                kv = helper.get_int(data, curr_data_index)      # u4
-                mat_idx = helper.get_int(data, curr_data_index) # u4
-                self.keyframes.append(dts_key_frames(pos, kv, mat_idx))
-        elif self.version >= 8: # Kaitai: keyframe (f4, u2, u2)
-            for _ in range(self.num_keyframes):
-                pos = helper.get_float(data, curr_data_index)      # f4
-                kv = helper.get_uint16(data, curr_data_index)     # u2
-                mat_idx = helper.get_uint16(data, curr_data_index)# u2
-                self.keyframes.append(dts_key_frames(pos, kv, mat_idx))
-        elif self.version < 3: # Your original logic
-            kf_struct = 'fi' # f4, s4 (position, key_value)
-            kf_bytesize = 8
-            for _ in range(0, self.num_keyframes):
-                [position, key_value] = struct.unpack(kf_struct, data[curr_data_index[0]:curr_data_index[0] + kf_bytesize])
-                curr_data_index[0] += kf_bytesize
-                self.keyframes.append(dts_key_frames(position, key_value, 0)) # mat_index is 0
-        else: # Versions 3 to 6 (assuming 12 bytes like your original code for <=7)
-            kf_struct = 'fii' # f4, s4, s4 (position, key_value, mat_index)
-            kf_bytesize = 12
-            for _ in range(0, self.num_keyframes):
-                [position, key_value, mat_index_val] = struct.unpack(kf_struct, data[curr_data_index[0]:curr_data_index[0] + kf_bytesize])
-                curr_data_index[0] += kf_bytesize
-                self.keyframes.append(dts_key_frames(position, key_value, mat_index_val))
-        print(f"DEBUG: After keyframes. Read {len(self.keyframes)}. curr_data_index: {curr_data_index[0]}")
-
-
-        print(f"DEBUG: Before transforms. Num_transforms: {self.num_transforms}. curr_data_index: {curr_data_index[0]}")
-        self.transforms = []
-        for _ in range(self.num_transforms):
-            # Quat16: x(s2), y(s2), z(s2), w(s2)
-            qx = helper.get_int16(data, curr_data_index)
-            qy = helper.get_int16(data, curr_data_index)
-            qz = helper.get_int16(data, curr_data_index)
-            qw = helper.get_int16(data, curr_data_index)
-            # Pass raw s2 values to dts_quat, or convert here.
-            # For now, dts_quat expects floats, so let's pass them as floats (though they are s2 ranges)
-            quat = dts_quat(float(qx), float(qy), float(qz), float(qw))
-            
-            translate = helper.get_float3d(data, curr_data_index) # Point3f
-            
-            scale = (1.0, 1.0, 1.0) # Default for v8+
-            if self.version <= 7: # Kaitai: transformv7 has scale (Point3f)
-                scale = helper.get_float3d(data, curr_data_index)
-            self.transforms.append(dts_transform(quat, translate, scale))
-        print(f"DEBUG: After transforms. Read {len(self.transforms)}. curr_data_index: {curr_data_index[0]}")
+        # Each table is decoded with one np.frombuffer; the per-row objects are built on access.
+        dtypes = table_dtypes(self.version)
+
+        trace.begin('nodes', stream, self.num_nodes)
+        self.node_table = stream.read_array(dtypes['node'], self.num_nodes)
+        self.nodes = helper.table_view(self.node_table, dts_node)
+        trace.end(stream)
+
+
+        trace.begin('sequences', stream, self.num_seq)
+        self.sequence_table = stream.read_array(dtypes['sequence'], self.num_seq)
+        self.sequences = helper.table_view(self.sequence_table, dts_sequence)
+        trace.end(stream)
 
 
-        print(f"DEBUG: Before names. Num_names: {self.num_names}. curr_data_index: {curr_data_index[0]}")
+        trace.begin('sub_sequences', stream, self.num_sub_seq)
+        self.sub_sequence_table = stream.read_array(dtypes['sub_sequence'], self.num_sub_seq)
+        self.sub_sequences = helper.table_view(self.sub_sequence_table, dts_sub_sequence)
+        trace.end(stream)
+
+
+        trace.begin('keyframes', stream, self.num_keyframes)
+        self.keyframe_table = stream.read_array(dtypes['keyframe'], self.num_keyframes)
+        self.keyframes = helper.table_view(self.keyframe_table, dts_key_frames)
+        trace.end(stream)
+
+
+        trace.begin('transforms', stream, self.num_transforms)
+        self.transform_table = stream.read_array(dtypes['transform'], self.num_transforms)
+        self.transforms = helper.table_view(self.transform_table, dts_transform.from_row)
+        trace.end(stream)
+
+        self.sub_sequence_index = self.build_sub_sequence_index()
+        self.child_offsets, self.child_nodes = self.build_children_index()
+
+
+        trace.begin('names', stream, self.num_names)
         self.names = []
         for _ in range(self.num_names):
-            self.names.append(data[curr_data_index[0]:curr_data_index[0] + 24]) # 24 bytes per name string
-            curr_data_index[0] += 24
-        print(f"DEBUG: After names. Read {len(self.names)}. curr_data_index: {curr_data_index[0]}")
+            self.names.append(bytes(stream.read_bytes(24))) # 24 bytes per name string
+        trace.end(stream)
+        self.build_name_lookups()
 
 
-        print(f"DEBUG: Before objects. Num_objects: {self.num_objects}. curr_data_index: {curr_data_index[0]}")
+        trace.begin('objects', stream, self.num_objects)
         self.objects = []
         for _ in range(self.num_objects):
             offset_flags_val = None; offset_rot_val = None; offset_val = None # Init for clarity
             if self.version == 7: # Kaitai: objectv7
-                name_idx = helper.get_uint16(data, curr_data_index)       # u2
-                flags_val = helper.get_uint16(data, curr_data_index)      # u2
-                mesh_idx = helper.get_int(data, curr_data_index)          # u4
-                node_idx = helper.get_int(data, curr_data_index)          # u4
-                offset_rot_val = dts_mat3f().read(data, curr_data_index)  # tmat3f
-                num_ss = helper.get_int(data, curr_data_index)            # u4
-                first_ss = helper.get_int(data, curr_data_index)          # u4
+                name_idx = stream.read_uint16()       # u2
+                flags_val = stream.read_uint16()      # u2
+                mesh_idx = stream.read_int()          # u4
+                node_idx = stream.read_int()          # u4
+                offset_rot_val = dts_mat3f().read(stream)  # tmat3f
+                num_ss = stream.read_int()            # u4
+                first_ss = stream.read_int()          # u4
             elif self.version >= 8: # Kaitai: objectv8
-                name_idx = helper.get_int16(data, curr_data_index)        # s2
-                flags_val = helper.get_int16(data, curr_data_index)       # s2
-                mesh_idx = helper.get_int(data, curr_data_index)          # s4 (Kaitai: s4)
-                node_idx = helper.get_int16(data, curr_data_index)        # s2
-                _ = helper.get_uint16(data, curr_data_index)              # dummy u2
-                offset_val = helper.get_float3d(data, curr_data_index)    # point3f
-                num_ss = helper.get_int16(data, curr_data_index)          # s2
-                first_ss = helper.get_int16(data, curr_data_index)        # s2
+                name_idx = stream.read_int16()        # s2
+                flags_val = stream.read_int16()       # s2
+                mesh_idx = stream.read_int()          # s4 (Kaitai: s4)
+                node_idx = stream.read_int16()        # s2
+                dummy = stream.read_uint16()          # dummy u2, kept for writing back
+                offset_val = stream.read_float3d()    # point3f
+                num_ss = stream.read_int16()          # s2
+                first_ss = stream.read_int16()        # s2
             else: # Versions < 7 (Your original logic for <=7)
-                name_idx = helper.get_int16(data, curr_data_index)
-                flags_val = helper.get_int16(data, curr_data_index)
-                mesh_idx = helper.get_int(data, curr_data_index)
-                node_idx = helper.get_int(data, curr_data_index) # Your original was s4
-                offset_rot_val = dts_mat3f().read(data, curr_data_index)
-                num_ss = helper.get_int16(data, curr_data_index) # Your original was s2
-                first_ss = helper.get_int16(data, curr_data_index) # Your original was s2
+                name_idx = stream.read_int16()
+                flags_val = stream.read_int16()
+                mesh_idx = stream.read_int()
+                node_idx = stream.read_int() # Your original was s4
+                offset_rot_val = dts_mat3f().read(stream)
+                num_ss = stream.read_int16() # Your original was s2
+                first_ss = stream.read_int16() # Your original was s2
             self.objects.append(dts_object(name_idx, flags_val, mesh_idx, node_idx, 
                                            offset_flags_val, offset_rot_val, offset_val, 
-                                           num_ss, first_ss))
-        print(f"DEBUG: After objects. Read {len(self.objects)}. curr_data_index: {curr_data_index[0]}")
+                                           num_ss, first_ss, dummy if self.version >= 8 else 0))
+        trace.end(stream)
 
 
-        print(f"DEBUG: Before details. Num_details: {self.num_details}. curr_data_index: {curr_data_index[0]}")
+        trace.begin('details', stream, self.num_details)
         self.details = []
         # Kaitai: detail (u4, f4) - consistent across versions
         for _ in range(self.num_details):
-            root_node_idx = helper.get_int(data, curr_data_index) # u4
-            size_val = helper.get_float(data, curr_data_index)    # f4
+            root_node_idx = stream.read_int() # u4
+            size_val = stream.read_float()    # f4
             self.details.append(dts_details(root_node_idx, size_val))
-        print(f"DEBUG: After details. Read {len(self.details)}. curr_data_index: {curr_data_index[0]}")
+        trace.end(stream)
 
 
-        print(f"DEBUG: Before transitions. Num_transitions: {self.num_transitions}. curr_data_index: {curr_data_index[0]}")
+        trace.begin('transitions', stream, self.num_transitions)
         self.transitions = []
         if self.num_transitions > 0: # Only read if num_transitions > 0
             if self.version == 7: # Kaitai: transitionv7 (u4, u4, f4, f4, transformv7)
                                   # transformv7: quat16, point3f (translate), point3f (scale)
                 for _ in range(self.num_transitions):
-                    start_seq = helper.get_int(data, curr_data_index)
-                    end_seq = helper.get_int(data, curr_data_index)
-                    start_pos = helper.get_float(data, curr_data_index)
-                    end_pos = helper.get_float(data, curr_data_index)
+                    start_seq = stream.read_int()
+                    end_seq = stream.read_int()
+                    start_pos = stream.read_float()
+                    end_pos = stream.read_float()
                     # transformv7 part
-                    qx = helper.get_int16(data, curr_data_index)
-                    qy = helper.get_int16(data, curr_data_index)
-                    qz = helper.get_int16(data, curr_data_index)
-                    qw = helper.get_int16(data, curr_data_index)
+                    qx = stream.read_int16()
+                    qy = stream.read_int16()
+                    qz = stream.read_int16()
+                    qw = stream.read_int16()
                     quat = dts_quat(float(qx), float(qy), float(qz), float(qw))
-                    trans_pos = helper.get_float3d(data, curr_data_index)
-                    trans_scale = helper.get_float3d(data, curr_data_index)
+                    trans_pos = stream.read_float3d()
+                    trans_scale = stream.read_float3d()
                     # dts_transition expects duration, but v7 doesn't have it here. Pass 0.
                     self.transitions.append(dts_transition(start_seq, end_seq, start_pos, end_pos, 0.0, 
                                                            quat, trans_pos, trans_scale))
             elif self.version >= 8: # Kaitai: transition (u4, u4, f4, f4, f4, transform)
                                    # transform: quat16, point3f (translate)
                 for _ in range(self.num_transitions):
-                    start_seq = helper.get_int(data, curr_data_index)
-                    end_seq = helper.get_int(data, curr_data_index)
-                    start_pos = helper.get_float(data, curr_data_index)
-                    end_pos = helper.get_float(data, curr_data_index)
-                    duration = helper.get_float(data, curr_data_index)
+                    start_seq = stream.read_int()
+                    end_seq = stream.read_int()
+                    start_pos = stream.read_float()
+                    end_pos = stream.read_float()
+                    duration = stream.read_float()
                     # transform part
-                    qx = helper.get_int16(data, curr_data_index)
-                    qy = helper.get_int16(data, curr_data_index)
-                    qz = helper.get_int16(data, curr_data_index)
-                    qw = helper.get_int16(data, curr_data_index)
+                    qx = stream.read_int16()
+                    qy = stream.read_int16()
+                    qz = stream.read_int16()
+                    qw = stream.read_int16()
                     quat = dts_quat(float(qx), float(qy), float(qz), float(qw))
-                    trans_pos = helper.get_float3d(data, curr_data_index)
+                    trans_pos = stream.read_float3d()
                     trans_scale = (1.0, 1.0, 1.0) # No scale in v8 transform
                     self.transitions.append(dts_transition(start_seq, end_seq, start_pos, end_pos, duration,
                                                            quat, trans_pos, trans_scale))
             else: # Versions < 7 (Your original logic)
-                tran_struct = "iifffffffffffff" # 15 * f4
-                tran_bytesize = 15 * 4
+                tran_struct = TRANSITION_STRUCT_V6 # 15 * f4
                 for _ in range(self.num_transitions):
                     # This unpacks too many floats if trying to match Kaitai's older transform (quat16, p3f, p3f)
                     # This part is hard to reconcile without knowing the exact v<7 format.
                     # For now, keeping your original logic for v<7.
-                    [ss, es, sp, ep, dur, rx,ry,rz,rw, px,py,pz, sx,sy,sz] = \
-                        struct.unpack(tran_struct, data[curr_data_index[0]:curr_data_index[0] + tran_bytesize])
-                    curr_data_index[0] += tran_bytesize
+                    [ss, es, sp, ep, dur, rx,ry,rz,rw, px,py,pz, sx,sy,sz] = stream.read_struct(tran_struct)
                     quat = dts_quat(rx, ry, rz, rw) # Assuming these are already float-like
                     t_pos = (px,py,pz); t_scale = (sx,sy,sz)
                     self.transitions.append(dts_transition(ss,es,sp,ep,dur,quat,t_pos,t_scale))
-        print(f"DEBUG: After transitions. Read {len(self.transitions)}. curr_data_index: {curr_data_index[0]}")
+        trace.end(stream)
 
 
-        print(f"DEBUG: Before frame_triggers. Num_frame_triggers: {self.num_frame_triggers}. curr_data_index: {curr_data_index[0]}")
+        trace.begin('frame_triggers', stream, self.num_frame_triggers)
         self.frame_trigger = []
         if self.num_frame_triggers > 0 and self.version >= 4: # Kaitai: frame_trigger (f4, u4)
             for _ in range(self.num_frame_triggers):
-                pos = helper.get_float(data, curr_data_index)
-                value = helper.get_int(data, curr_data_index) # u4
+                pos = stream.read_float()
+                value = stream.read_int() # u4
                 self.frame_trigger.append(dts_frame_trigger(pos, value))
-        print(f"DEBUG: After frame_triggers. Read {len(self.frame_trigger)}. curr_data_index: {curr_data_index[0]}")
+        trace.end(stream)
 
 
+        trace.begin('shape_defaults', stream)
         if self.version >= 5: # Kaitai: default_material (u4)
-            self.default_materials = helper.get_int(data, curr_data_index)
+            self.default_materials = stream.read_int()
         else: self.default_materials = 0
-        print(f"DEBUG: Default materials: {self.default_materials}. curr_data_index: {curr_data_index[0]}")
 
         if self.version >= 6: # Kaitai: always_animate (s4)
-            self.always_node = helper.get_sint(data, curr_data_index)
+            self.always_node = stream.read_sint()
         else: self.always_node = -1
-        print(f"DEBUG: Always node: {self.always_node}. curr_data_index: {curr_data_index[0]}")
+        trace.end(stream, default_materials=self.default_materials, always_node=self.always_node)
 
 
-        print(f"DEBUG: Before meshes. Num_meshes: {self.num_meshes}. curr_data_index: {curr_data_index[0]}")
-        self.meshes = []
+        trace.begin('mesh_index', stream, self.num_meshes)
+        # First pass only records where each mesh lives (PERS + u4 chunk size + payload);
+        # the meshes themselves are decoded when shape.meshes[i] is first accessed.
+        mesh_ranges = []
         for i in range(self.num_meshes):
-            print(f"DEBUG: Reading mesh {i + 1}/{self.num_meshes}. curr_data_index before mesh: {curr_data_index[0]}")
             # Check for PERS header of the mesh itself
-            if curr_data_index[0] + 4 > len(data) or data[curr_data_index[0]:curr_data_index[0] + 4] != b"PERS":
-                print(f"ERROR: Expected PERS header for mesh {i+1} at offset {curr_data_index[0]}, but not found or EOS.")
-                # Fill with None or break, depending on how you want to handle partial loads
-                self.meshes.append(None) # Or some placeholder
+            if stream.offset + 8 > len(stream) or stream.peek_bytes(4) != b"PERS":
+                print(f"ERROR: Expected PERS header for mesh {i+1} at offset {stream.offset}, but not found or EOS.")
+                mesh_ranges.append(None) # Decodes as None
                 continue # Try to parse next mesh if any, or just break
             
-            mesh_instance = dts_mesh.mesh(data, curr_data_index)
-            # dts_mesh.mesh advances curr_data_index internally
-            if not hasattr(mesh_instance, 'faces'): # Basic check if mesh init failed PERS check or other critical parts
-                print(f"ERROR: Mesh instance {i + 1} seems uninitialized or failed its own PERS/CelAnimMesh check.")
-            self.meshes.append(mesh_instance)
-            print(f"DEBUG: Reading mesh {i + 1}/{self.num_meshes}. curr_data_index after mesh: {curr_data_index[0]}")
-        print(f"DEBUG: After meshes. Read {len(self.meshes)}. curr_data_index: {curr_data_index[0]}")
-
+            mesh_start = stream.offset
+            stream.skip(4)
+            mesh_chunk_size = stream.read_int()
+            stream.skip(mesh_chunk_size)
+            mesh_ranges.append((mesh_start, stream.offset))
+        trace.end(stream)
+        # Each mesh gets its own section when it is decoded, which for lazy meshes is on first access
+        self.meshes = dts_mesh.mesh_list(stream.view, mesh_ranges, trace)
+        if not lazy_meshes or mesh_workers:
+            self.meshes.load_all(mesh_workers)
+
+
+        trace.begin('material_list', stream)
+        has_materials_flag_value = self.read_material_list(stream)
+        trace.end(stream, count=len(self.material_list), has_materials=has_materials_flag_value,
+                  material_list_version=self.dts_version_from_material_list_pers, at_eof=stream.at_end())
+        self.trailing_data = bytes(stream.view[stream.offset:])
+        trace.finish()
+        return True # Indicate success
 
-        print(f"DEBUG: Before material list. curr_data_index: {curr_data_index[0]}")
-        has_materials_flag_value = helper.get_int(data, curr_data_index) # s4 in Kaitai, u4 in your helper
-        print(f"DEBUG: has_materials_flag_value: {has_materials_flag_value}")
+    def read_material_list(self, stream):
+        """Reads the trailing has-materials flag and TS::MaterialList block. Returns the flag."""
+        has_materials_flag_value = stream.read_int() # s4 in Kaitai, u4 in your helper
 
         if has_materials_flag_value == 1:
-            if curr_data_index[0] + 4 <= len(data) and data[curr_data_index[0]:curr_data_index[0] + 4] == b"PERS":
-                curr_data_index[0] += 4 
-                _ = helper.get_int(data, curr_data_index) # block_size
+            if stream.offset + 4 <= len(stream) and stream.peek_bytes(4) == b"PERS":
+                stream.skip(4)
+                _ = stream.read_int() # block_size
 
-                mat_classname_len = helper.get_uint16(data, curr_data_index) # u2
+                mat_classname_len = stream.read_uint16() # u2
                 mat_actual_classname_len_to_read = (mat_classname_len + 1) & (~1)
-                mat_classname_bytes = data[curr_data_index[0]:curr_data_index[0] + mat_classname_len]
-                curr_data_index[0] += mat_actual_classname_len_to_read
+                mat_classname_bytes = stream.peek_bytes(mat_classname_len)
+                stream.skip(mat_actual_classname_len_to_read)
                 
                 if mat_classname_bytes == b'TS::MaterialList':
-                    self.dts_version_from_material_list_pers = helper.get_int(data, curr_data_index) # u4
-                    print(f"DEBUG: MaterialList version: {self.dts_version_from_material_list_pers}")
+                    self.dts_version_from_material_list_pers = stream.read_int() # u4
                     
-                    _num_details_in_matlist = helper.get_int(data, curr_data_index) # u4
-                    num_actual_materials = helper.get_int(data, curr_data_index)   # u4
-                    print(f"DEBUG: Num materials in list: {num_actual_materials}, num_details_in_matlist: {_num_details_in_matlist}")
+                    self.material_list_num_details = stream.read_int() # u4
+                    num_actual_materials = stream.read_int()   # u4
 
                     for _ in range(num_actual_materials): # Kaitai: repeat-expr: num_materials (which is num_actual_materials here)
-                        mat_param = dts_material_param(data, curr_data_index, self.dts_version_from_material_list_pers)
+                        mat_param = dts_material_param(stream, self.dts_version_from_material_list_pers)
                         self.material_list.append(mat_param)
-                    print(f"DEBUG: Parsed {len(self.material_list)} materials.")
                 else:
-                    print(f"Warning: Expected 'TS::MaterialList' PERS block, but found '{mat_classname_bytes.decode('utf-8','ignore')}'")
+                    print(f"Warning: Expected 'TS::MaterialList' PERS block, but found '{bytes(mat_classname_bytes).decode('utf-8','ignore')}'")
             else:
                 print("Warning: has_materials_flag is 1, but no 'PERS' block found for materials where expected.")
-        print(f"DEBUG: After material list. curr_data_index: {curr_data_index[0]}. EOF: {curr_data_index[0] >= len(data)}")
-        
-        self.print_stats()
-        return True # Indicate success
+        return has_materials_flag_value
+
+    def build_name_lookups(self):
+        """Decodes the names table once and builds the case-insensitive name lookups."""
+        self.name_strings = [decode_name(raw) for raw in self.names]
+        self.name_lookup = {}
+        for i, name in enumerate(self.name_strings):
+            self.name_lookup.setdefault(name.lower(), i)
+        self.sequence_lookup = self.index_by_name(self.sequence_table['name_index'])
+        self.node_lookup = self.index_by_name(self.node_table['name_index'])
+
+    def index_by_name(self, name_indices):
+        """Maps lower-cased names to the first row whose name index refers to them."""
+        lookup = {}
+        for i, name_idx in enumerate(name_indices.tolist()):
+            if 0 <= name_idx < len(self.name_strings):
+                lookup.setdefault(self.name_strings[name_idx].lower(), i)
+        return lookup
+
+    def get_name(self, name_idx, default=""):
+        """Decoded name for a names table index, or `default` if it is out of range."""
+        if 0 <= name_idx < len(self.name_strings):
+            return self.name_strings[name_idx]
+        return default
+
+    def find_sequence(self, name):
+        """Index of the first sequence called `name` (case-insensitive), or -1."""
+        return self.sequence_lookup.get(name.lower(), -1)
+
+    def find_node(self, name):
+        """Index of the first node called `name` (case-insensitive), or -1."""
+        return self.node_lookup.get(name.lower(), -1)
+
+    def build_children_index(self):
+        """(offsets, children) CSR index of the node hierarchy, children in node order.
+
+        A node whose parent is -1, itself or out of range is nobody's child.
+        """
+        parents = self.node_table['parent_node'].astype(np.int64)
+        node_ids = np.arange(len(parents))
+        is_child = (parents >= 0) & (parents < len(parents)) & (parents != node_ids)
+        order = np.argsort(parents[is_child], kind='stable')
+        children = node_ids[is_child][order].astype(np.int32)
+        offsets = np.zeros(len(parents) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(parents[is_child], minlength=len(parents)), out=offsets[1:])
+        return offsets, children
+
+    def get_children(self, node_idx):
+        """Read-only array of the direct children of a node."""
+        return self.child_nodes[self.child_offsets[node_idx]:self.child_offsets[node_idx + 1]]
+
+    def get_descendant_nodes(self, root_node_idx):
+        """Set of a node and everything below it, walked through the children index in linear time.
+
+        Empty for an out-of-range node. Each node is visited once, so parent cycles are harmless.
+        """
+        if not 0 <= root_node_idx < self.num_nodes:
+            return set()
+        offsets = self.child_offsets.tolist()
+        children = self.child_nodes.tolist()
+        descendants = {root_node_idx}
+        stack = [root_node_idx]
+        while stack:
+            node = stack.pop()
+            for child in children[offsets[node]:offsets[node + 1]]:
+                if child not in descendants:
+                    descendants.add(child)
+                    stack.append(child)
+        return descendants
+
+    def build_sub_sequence_index(self):
+        """(num_nodes, num_seq) int32 array of the sub-sequence animating each node in each sequence.
+
+        -1 where the node has no keyframed sub-sequence for that sequence. Where a node lists
+        several, the first one wins, matching a linear scan of its sub-sequence range.
+        """
+        nodes = self.node_table
+        index = np.full((self.num_nodes, self.num_seq), -1, dtype=np.int32)
+        counts = nodes['num_sub_seq'].astype(np.int64)
+        if counts.sum() == 0:
+            return index
+
+        owner = np.repeat(np.arange(self.num_nodes), counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sub_seq_idx = nodes['first_sub_seq'].astype(np.int64)[owner] + np.arange(len(owner)) - starts[owner]
+        in_range = (sub_seq_idx >= 0) & (sub_seq_idx < self.num_sub_seq)
+        owner, sub_seq_idx = owner[in_range], sub_seq_idx[in_range]
+
+        sub_seqs = self.sub_sequence_table[sub_seq_idx]
+        sequence_idx = sub_seqs['sequence_idx'].astype(np.int64)
+        keep = (sub_seqs['num_key_frames'] > 0) & (sequence_idx >= 0) & (sequence_idx < self.num_seq)
+        owner, sequence_idx, sub_seq_idx = owner[keep], sequence_idx[keep], sub_seq_idx[keep]
+
+        # np.unique reports the first occurrence of each (node, sequence) pair
+        _, first = np.unique(owner * self.num_seq + sequence_idx, return_index=True)
+        index[owner[first], sequence_idx[first]] = sub_seq_idx[first]
+        return index
+
+    def get_transform_matrices(self, transpose_rotation=False, dtype=np.float32):
+        """All transforms as an (N,4,4) matrix stack, built in one vectorized pass and memoized.
+
+        transpose_rotation=True gives the transposed-rotation variant used for player models.
+        """
+        key = (transpose_rotation, np.dtype(dtype).str)
+        if key not in self.transform_matrix_stacks:
+            table = self.transform_table
+            scale = table['scale'] if 'scale' in table.dtype.names else None
+            self.transform_matrix_stacks[key] = dts_transforms.transform_matrices(
+                table['rotate'], table['translate'], scale, transpose_rotation, dtype)
+        return self.transform_matrix_stacks[key]
+
+    def get_pose_transform_indices(self, sequence_idx=-1, use_last_keyframe=False):
+        """(num_nodes,) transform index each node is posed with, -1 where it has none.
+
+        A node keyframed in the sequence takes its first (or last) keyframe's transform, any
+        other node its default transform. Out-of-range indices fall through to the next choice.
+        """
+        default_idx = self.node_table['transform_index'].astype(np.int64)
+        pose_idx = np.where((default_idx >= 0) & (default_idx < self.num_transforms), default_idx, -1)
+        if not 0 <= sequence_idx < self.num_seq:
+            return pose_idx
+
+        sub_seq_idx = self.sub_sequence_index[:, sequence_idx]
+        animated = np.flatnonzero(sub_seq_idx >= 0)
+        sub_seqs = self.sub_sequence_table[sub_seq_idx[animated]]
+        key_idx = sub_seqs['first_key_frame'].astype(np.int64)
+        if use_last_keyframe:
+            key_idx += sub_seqs['num_key_frames'].astype(np.int64) - 1
+        has_key = (key_idx >= 0) & (key_idx < self.num_keyframes)
+        animated, key_idx = animated[has_key], key_idx[has_key]
+        key_values = self.keyframe_table['key_value'][key_idx].astype(np.int64)
+        valid = (key_values >= 0) & (key_values < self.num_transforms)
+        pose_idx[animated[valid]] = key_values[valid]
+        return pose_idx
+
+    def get_world_matrices(self, sequence_idx=-1, use_last_keyframe=False, transpose_rotation=False):
+        """(num_nodes, 4, 4) float64 world matrix of every node, posed as get_pose_transform_indices().
+
+        The hierarchy is ordered into levels once per shape; each pose is then one gather from the
+        transform stack and one batched matmul per level, and is memoized.
+        """
+        key = (sequence_idx, use_last_keyframe, transpose_rotation)
+        if key not in self.world_matrix_stacks:
+            if self.node_levels is None:
+                self.node_levels = dts_transforms.hierarchy_levels(self.node_table['parent_node'])
+            pose_idx = self.get_pose_transform_indices(sequence_idx, use_last_keyframe)
+            local = np.tile(np.identity(4), (self.num_nodes, 1, 1))
+            posed = pose_idx >= 0
+            local[posed] = self.get_transform_matrices(transpose_rotation, np.float64)[pose_idx[posed]]
+            self.world_matrix_stacks[key] = dts_transforms.world_matrices(local, self.node_table['parent_node'], self.node_levels)
+        return self.world_matrix_stacks[key]
+
+    @staticmethod
+    def probe(file_name):
+        """Reads a shape's header tables and material list without decoding any mesh.
+
+        Mesh payloads are skipped by their PERS chunk size and the file is memory-mapped,
+        so only the pages holding the tables are touched. Returns a dts_metadata record,
+        or None if the file is not a TS::Shape.
+        """
+        shape = dts()
+        stream = helper.binary_reader(helper.map_file(file_name))
+        if not shape.read_header(stream):
+            return None
+        sizes = table_record_sizes(shape.version)
+
+        stream.skip(shape.num_nodes * sizes['node'])
+        sequence_name_indices = []
+        for _ in range(shape.num_seq):
+            sequence_name_indices.append(stream.read_int())
+            stream.skip(sizes['sequence'] - 4)
+        stream.skip(shape.num_sub_seq * sizes['sub_sequence'])
+        stream.skip(shape.num_keyframes * sizes['keyframe'])
+        stream.skip(shape.num_transforms * sizes['transform'])
+        names = [decode_name(stream.read_bytes(sizes['name'])) for _ in range(shape.num_names)]
+        stream.skip(shape.num_objects * sizes['object'])
+        details = stream.read_array(DETAIL_DTYPE, shape.num_details)
+        stream.skip(shape.num_transitions * sizes['transition'])
+        if shape.version >= 4:
+            stream.skip(shape.num_frame_triggers * sizes['frame_trigger'])
+        if shape.version >= 5:
+            stream.skip(4) # default_materials
+        if shape.version >= 6:
+            stream.skip(4) # always_node
+
+        for _ in range(shape.num_meshes):
+            if stream.offset + 8 > len(stream) or stream.peek_bytes(4) != b"PERS":
+                break # Can't skip past a broken mesh, so the material list is out of reach
+            stream.skip(4)
+            stream.skip(stream.read_int())
+        else:
+            shape.read_material_list(stream)
+
+        meta = dts_metadata()
+        meta.file_name = str(file_name)
+        meta.version = shape.version
+        meta.num_nodes = shape.num_nodes
+        meta.num_objects = shape.num_objects
+        meta.num_meshes = shape.num_meshes
+        meta.num_keyframes = shape.num_keyframes
+        meta.radius = shape.radius
+        meta.sequence_names = [names[i] if 0 <= i < len(names) else "" for i in sequence_name_indices]
+        meta.detail_sizes = details['size'].tolist()
+        meta.material_names = [mat.map_file for mat in shape.material_list]
+        return meta
+
+    def load_file(self, file_name, use_mmap=False, lazy_meshes=True, trace=None, cache=None, mesh_workers=None):
+        """Parses a shape file. With a parse_cache.parse_cache as `cache`, an unchanged file is
+        restored from its cache entry instead (every mesh is decoded when the entry is written)."""
+        if use_mmap:
+            data = helper.map_file(file_name)
+        else:
+            with open(file_name, "rb") as file:
+                data = file.read()
+        if cache is None:
+            return self.load_binary(data, lazy_meshes, trace, mesh_workers)
+
+        key = cache.make_key(data, 'dts', CACHE_VERSION)
+        entry = cache.load(key)
+        if entry is not None:
+            self.load_cache_entry(*entry)
+            return True
+        if not self.load_binary(data, False, trace, mesh_workers):
+            return False
+        cache.store(key, *self.cache_entry())
+        return True
+
+    def cache_entry(self):
+        """Splits the parsed shape into a JSON-able meta dict and the arrays parse_cache stores."""
+        meta = {name: getattr(self, name) for name in CACHED_HEADER_FIELDS}
+        meta['objects'] = [dict(vars(obj), offset_rot=vars(obj.offset_rot) if obj.offset_rot else None)
+                           for obj in self.objects]
+        meta['details'] = [vars(detail) for detail in self.details]
+        meta['transitions'] = [dict(vars(transition), transform_rot=[transition.transform_rot.x, transition.transform_rot.y,
+                                                                     transition.transform_rot.z, transition.transform_rot.w])
+                               for transition in self.transitions]
+        meta['frame_triggers'] = [vars(trigger) for trigger in self.frame_trigger]
+        meta['materials'] = [vars(material) for material in self.material_list]
+
+        arrays = {
+            'nodes': self.node_table, 'sequences': self.sequence_table, 'sub_sequences': self.sub_sequence_table,
+            'keyframes': self.keyframe_table, 'transforms': self.transform_table,
+            'names': np.frombuffer(b''.join(self.names), dtype=np.uint8).reshape(-1, 24),
+            'trailing_data': np.frombuffer(self.trailing_data, dtype=np.uint8),
+        }
+
+        # Mesh tables are concatenated across meshes; frames always use the v3+ layout
+        meshes = [m if m is not None and hasattr(m, 'frame_table') else None for m in self.meshes]
+        meta['meshes'] = [m.get_header() if m is not None else None for m in meshes]
+        present = [m for m in meshes if m is not None]
+        frames = np.zeros(sum(len(m.frame_table) for m in present), dtype=dts_mesh.FRAME_DTYPE)
+        frames['first_vert'] = np.concatenate([m.frame_table['first_vert'] for m in present] or [[]])
+        has_scale = np.concatenate([np.full(len(m.frame_table), 'scale' in m.frame_table.dtype.names) for m in present] or [[]])
+        if has_scale.any():
+            for name in ('scale', 'origin'):
+                frames[name][has_scale] = np.concatenate([m.frame_table[name] for m in present if 'scale' in m.frame_table.dtype.names])
+        arrays['mesh_verts'] = np.concatenate([m.vert_table for m in present] or [np.empty((0, 4), dts_mesh.VERT_DTYPE)])
+        arrays['mesh_text_verts'] = np.concatenate([m.text_vert_table for m in present] or [np.empty((0, 2), dts_mesh.TEXT_VERT_DTYPE)])
+        arrays['mesh_faces'] = np.concatenate([m.face_table for m in present] or [np.empty((0, 7), dts_mesh.FACE_DTYPE)])
+        arrays['mesh_frames'] = frames
+        meta['mesh_rows'] = [[len(m.vert_table), len(m.text_vert_table), len(m.face_table), len(m.frame_table)] for m in present]
+        return meta, arrays
+
+    def load_cache_entry(self, meta, arrays):
+        """Restores a shape from cache_entry() output; the tables stay memory-mapped."""
+        for name in CACHED_HEADER_FIELDS:
+            value = meta[name]
+            setattr(self, name, tuple(value) if isinstance(value, list) else value)
+
+        self.node_table = arrays['nodes']
+        self.nodes = helper.table_view(self.node_table, dts_node)
+        self.sequence_table = arrays['sequences']
+        self.sequences = helper.table_view(self.sequence_table, dts_sequence)
+        self.sub_sequence_table = arrays['sub_sequences']
+        self.sub_sequences = helper.table_view(self.sub_sequence_table, dts_sub_sequence)
+        self.keyframe_table = arrays['keyframes']
+        self.keyframes = helper.table_view(self.keyframe_table, dts_key_frames)
+        self.transform_table = arrays['transforms']
+        self.transforms = helper.table_view(self.transform_table, dts_transform.from_row)
+        self.sub_sequence_index = self.build_sub_sequence_index()
+        self.child_offsets, self.child_nodes = self.build_children_index()
+        self.names = [row.tobytes() for row in arrays['names']]
+        self.build_name_lookups()
+        self.trailing_data = arrays['trailing_data'].tobytes()
 
-    def load_file(self, file_name):
-        with open(file_name, "rb") as file:
-            data = file.read()
-            return self.load_binary(data)
+        self.objects = []
+        for obj in meta['objects']:
+            offset_rot = None
+            if obj['offset_rot']:
+                offset_rot = dts_mat3f()
+                offset_rot.flags = obj['offset_rot']['flags']
+                offset_rot.arr_3_3 = obj['offset_rot']['arr_3_3']
+                offset_rot.point = tuple(obj['offset_rot']['point'])
+            self.objects.append(dts_object(obj['name'], obj['flags'], obj['mesh_index'], obj['node_index'], obj['offset_flags'],
+                                           offset_rot, tuple(obj['offset']) if obj['offset'] else None,
+                                           obj['num_sub_seq'], obj['first_sub_seq'], obj['dummy']))
+        self.details = [dts_details(detail['root_node'], detail['size']) for detail in meta['details']]
+        self.transitions = [dts_transition(t['start_seq'], t['end_seq'], t['start_pos'], t['end_pos'], t['duration'],
+                                           dts_quat(*t['transform_rot']), tuple(t['transform_pos']), tuple(t['transform_scale']))
+                            for t in meta['transitions']]
+        self.frame_trigger = [dts_frame_trigger(trigger['pos'], trigger['value']) for trigger in meta['frame_triggers']]
+        self.material_list = []
+        for material in meta['materials']:
+            material_param = dts_material_param.__new__(dts_material_param)
+            material_param.__dict__.update(material)
+            self.material_list.append(material_param)
+
+        meshes = []
+        offsets = np.zeros(4, dtype=np.int64)
+        rows = iter(meta['mesh_rows'])
+        for header in meta['meshes']:
+            if header is None:
+                meshes.append(None)
+                continue
+            end = offsets + next(rows)
+            frame_table = arrays['mesh_frames'][offsets[3]:end[3]]
+            if header['version'] < 3: # Back to the v2 layout, which has no per-frame scale/origin
+                v2_frame_table = np.zeros(len(frame_table), dtype=dts_mesh.FRAME_DTYPE_V2)
+                v2_frame_table['first_vert'] = frame_table['first_vert']
+                frame_table = v2_frame_table
+            meshes.append(dts_mesh.mesh.from_tables(
+                header, arrays['mesh_verts'][offsets[0]:end[0]], arrays['mesh_text_verts'][offsets[1]:end[1]],
+                arrays['mesh_faces'][offsets[2]:end[2]], frame_table))
+            offsets = end
+        self.meshes = dts_mesh.mesh_list.from_meshes(meshes)
 
     def dump_obj_test(self, folder_name):
         # ... (This method seems fine, no changes needed based on current issues) ...
@@ -459,7 +799,7 @@ class dts:
         print(f"Num Nodes: {self.num_nodes} (Parsed: {len(self.nodes) if self.nodes else 0})")
         print(f"Num Sequences: {self.num_seq} (Parsed: {len(self.sequences) if self.sequences else 0})")
         # ... add more stats for other lists ...
-        print(f"Num Meshes: {self.num_meshes} (Parsed: {len(self.meshes) if self.meshes else 0})")
+        print(f"Num Meshes: {self.num_meshes} (Indexed: {len(self.meshes) if self.meshes else 0})")
         print(f"Num Materials in List: {len(self.material_list) if self.material_list else 0}")
         # ...
         # split_arg = b"\\x00" # Corrected: use bytes for split
@@ -472,6 +812,23 @@ class dts:
         #     # print(f"Node {i}: Name='{node_name}', Parent={node_obj.parent_node}")
 
 
+class dts_metadata:
+    """Summary of a shape returned by dts.probe()."""
+    def __init__(self):
+        self.file_name = None
+        self.version = None
+        self.num_nodes = 0
+        self.num_objects = 0
+        self.num_meshes = 0
+        self.num_keyframes = 0
+        self.radius = 0.0
+        self.sequence_names = []
+        self.detail_sizes = []
+        self.material_names = []
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
 class dts_node:
     def __init__(self, name_idx, parent_node_idx, num_sub_seq, first_sub_seq, default_transform_idx):
         self.name_index = name_idx
@@ -481,8 +838,8 @@ class dts_node:
         self.transform_index = default_transform_idx
 
 class dts_sequence:
-    def __init__(self, name_idx, cyclic, duration, priority, first_trigger_frame, num_trigger_frames, num_ifl_subsequences,
-                 first_ifl_subsequence):
+    def __init__(self, name_idx, cyclic, duration, priority, first_trigger_frame=0, num_trigger_frames=0, num_ifl_subsequences=0,
+                 first_ifl_subsequence=0):
         self.name_index = name_idx
         self.cyclic = cyclic
         self.duration = duration
@@ -499,7 +856,7 @@ class dts_sub_sequence:
         self.first_key_frame = first_key_frame
 
 class dts_key_frames:
-    def __init__(self, position, key_value, mat_index):
+    def __init__(self, position, key_value, mat_index=0):
         self.position = position
         self.key_value = key_value
         self.mat_index = mat_index
@@ -510,8 +867,15 @@ class dts_transform:
         self.translate = translate_vec # Should be a (x,y,z) tuple
         self.scale = scale_vec # Should be a (x,y,z) tuple
 
+    @classmethod
+    def from_row(cls, rotate, translate, scale=None):
+        """Builds a transform from a transform_table row (raw Quat16, translate, optional scale)."""
+        qx, qy, qz, qw = rotate.tolist()
+        scale_vec = tuple(scale.tolist()) if scale is not None else (1.0, 1.0, 1.0) # Default for v8+
+        return cls(dts_quat(float(qx), float(qy), float(qz), float(qw)), tuple(translate.tolist()), scale_vec)
+
 class dts_object:
-    def __init__(self, name_idx, flags_val, mesh_idx, node_idx, offset_flags_val, offset_rot_val, offset_val, num_sub_seq, first_sub_seq):
+    def __init__(self, name_idx, flags_val, mesh_idx, node_idx, offset_flags_val, offset_rot_val, offset_val, num_sub_seq, first_sub_seq, dummy=0):
         self.name = name_idx
         self.flags = flags_val
         self.mesh_index = mesh_idx
@@ -521,6 +885,7 @@ class dts_object:
         self.offset = offset_val             # This is a Point3F for v8+
         self.num_sub_seq = num_sub_seq
         self.first_sub_seq = first_sub_seq
+        self.dummy = dummy                   # v8 padding word, written back unchanged
 
     # ... (get_translate_rotation method - no change needed for this fix) ...
 
@@ -592,8 +957,8 @@ class dts_mat3f:
         self.arr_3_3 = None # 3x3 matrix as a flat list of 9 floats
         self.point = None   # (x,y,z) translation
 
-    def read(self, data, offset_arr): # Changed to offset_arr
-        self.flags = helper.get_int(data, offset_arr) # u4
-        self.arr_3_3 = helper.get_float_array(data, 9, offset_arr)
-        self.point = helper.get_float3d(data, offset_arr)
+    def read(self, stream):
+        self.flags = stream.read_int() # u4
+        self.arr_3_3 = stream.read_float_array(9)
+        self.point = stream.read_float3d()
         return self
\ No newline at end of file
@@ -1,86 +1,236 @@
-from dts_module import helper
-from dts_module import tribes_normal
-
-
-class mesh:
-    def __init__(self, data, data_index):
-        if data[data_index[0]:data_index[0] + 4] != b"PERS":
-            print("Wrong PERS header")
-            return
-
-        data_index[0] += 4 # Flags?  Don't know...skipping for now
-        chunk_size = helper.get_int(data, data_index)
-        data_index[0] += 2 # Flags?  Don't know...skipping for now
-
-        if data[data_index[0]:data_index[0] + 15] != b'TS::CelAnimMesh':
-            print("Not a TS::CelAnimMesh")
-            return
-
-        data_index[0] += 16
-        version = helper.get_int(data, data_index)
-        self.num_verts = helper.get_int(data, data_index)
-        self.verts_per_frame = helper.get_int(data, data_index)
-        self.num_texture_verts = helper.get_int(data, data_index)
-        self.num_faces = helper.get_int(data, data_index)
-        self.num_frames = helper.get_int(data, data_index)
-
-        if version >= 2:
-            self.texture_verts_per_frame = helper.get_int(data, data_index)
-        else:
-            self.texture_verts_per_frame = self.num_texture_verts
-
-        if version < 3:
-            self.v2_scale = helper.get_float3d(data, data_index)
-            self.v2_origin = helper.get_float3d(data, data_index)
-
-        self.radius = helper.get_float(data, data_index)
-
-        self.verts = []
-        for _ in range(0, self.num_verts):
-            self.verts.append(dts_vert(data, data_index))
-
-        self.text_verts = []
-        for _ in range(0, self.num_texture_verts):
-            self.text_verts.append(helper.get_float2d(data, data_index))
-
-        self.faces = []
-        for _ in range(0, self.num_faces):
-            self.faces.append(dts_mesh_face(data, data_index))
-
-        self.frames = []
-        for _ in range(0, self.num_frames):
-            self.frames.append(dts_frame(version, data, data_index))
-
-
-class dts_vert:
-    def __init__(self, data, data_index):
-        self.packed_x = helper.get_int8(data, data_index)
-        self.packed_y = helper.get_int8(data, data_index)
-        self.packed_z = helper.get_int8(data, data_index)
-        self.normal_index = helper.get_int8(data, data_index)
-        self.normal = tribes_normal.tribes_normal_table[self.normal_index]
-
-    def get_unpacked_vert(self, scale, origin):
-        return (self.packed_x * scale[0] + origin[0],
-                self.packed_y * scale[1] + origin[1],
-                self.packed_z * scale[2] + origin[2])
-
-    def get_normal(self):
-        return self.normal
-
-class dts_mesh_face:
-    def __init__(self, data, data_index):
-        self.vert_index0 = helper.get_int(data, data_index)
-        self.tex_index0 = helper.get_int(data, data_index)
-        self.vert_index1 = helper.get_int(data, data_index)
-        self.tex_index1 = helper.get_int(data, data_index)
-        self.vert_index2 = helper.get_int(data, data_index)
-        self.tex_index2 = helper.get_int(data, data_index)
-        self.mat_index = helper.get_int(data, data_index)
-
-class dts_frame:
-    def __init__(self, version, data, data_index):
-        self.first_vert = helper.get_int(data, data_index)
-        if version >= 3:
-            self.scale = helper.get_float3d(data, data_index)
-            self.origin = helper.get_float3d(data, data_index)
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from dts_module import helper
+from dts_module import parse_trace
+from dts_module import tribes_normal
+
+
+# On-disk layouts of the CelAnimMesh tables (all little-endian)
+VERT_DTYPE = np.dtype('u1')         # packed_x, packed_y, packed_z, normal_index
+TEXT_VERT_DTYPE = np.dtype('<f4')   # u, v
+FACE_DTYPE = np.dtype('<i4')        # vert0, tex0, vert1, tex1, vert2, tex2, mat_index
+FRAME_DTYPE_V2 = np.dtype([('first_vert', '<i4')])
+FRAME_DTYPE = np.dtype([('first_vert', '<i4'), ('scale', '<f4', (3,)), ('origin', '<f4', (3,))])
+
+# Header attributes that, together with the four tables, fully describe a decoded mesh
+HEADER_FIELDS = ('version', 'num_verts', 'verts_per_frame', 'num_texture_verts', 'num_faces', 'num_frames',
+                 'texture_verts_per_frame', 'radius')
+V2_HEADER_FIELDS = ('v2_scale', 'v2_origin')
+
+
+class mesh:
+    def __init__(self, stream):
+        if stream.peek_bytes(4) != b"PERS":
+            print("Wrong PERS header")
+            return
+
+        stream.skip(4) # Flags?  Don't know...skipping for now
+        chunk_size = stream.read_int()
+        stream.skip(2) # Flags?  Don't know...skipping for now
+
+        if stream.peek_bytes(15) != b'TS::CelAnimMesh':
+            print("Not a TS::CelAnimMesh")
+            return
+
+        stream.skip(16)
+        self.version = version = stream.read_int()
+        self.num_verts = stream.read_int()
+        self.verts_per_frame = stream.read_int()
+        self.num_texture_verts = stream.read_int()
+        self.num_faces = stream.read_int()
+        self.num_frames = stream.read_int()
+
+        if version >= 2:
+            self.texture_verts_per_frame = stream.read_int()
+        else:
+            self.texture_verts_per_frame = self.num_texture_verts
+
+        if version < 3:
+            self.v2_scale = stream.read_float3d()
+            self.v2_origin = stream.read_float3d()
+
+        self.radius = stream.read_float()
+
+        # Raw tables, decoded in one go. These are read-only views into the stream's buffer.
+        self.vert_table = stream.read_array(VERT_DTYPE, self.num_verts, 4)
+        self.text_vert_table = stream.read_array(TEXT_VERT_DTYPE, self.num_texture_verts, 2)
+        self.face_table = stream.read_array(FACE_DTYPE, self.num_faces, 7)
+        frame_dtype = FRAME_DTYPE if version >= 3 else FRAME_DTYPE_V2
+        self.frame_table = stream.read_array(frame_dtype, self.num_frames)
+        self.build_views()
+
+    @classmethod
+    def from_tables(cls, header, vert_table, text_vert_table, face_table, frame_table):
+        """Rebuilds a mesh from its header attributes and tables, e.g. out of the parse cache."""
+        instance = cls.__new__(cls)
+        for name, value in header.items():
+            setattr(instance, name, tuple(value) if name in V2_HEADER_FIELDS else value)
+        instance.vert_table = vert_table
+        instance.text_vert_table = text_vert_table
+        instance.face_table = face_table
+        instance.frame_table = frame_table
+        instance.build_views()
+        return instance
+
+    def get_header(self):
+        """The header attributes from_tables() needs, as plain Python values."""
+        fields = HEADER_FIELDS + (V2_HEADER_FIELDS if self.version < 3 else ())
+        return {name: getattr(self, name) for name in fields}
+
+    def build_views(self):
+        # Per-element views kept for code that still walks the mesh one vertex/face at a time
+        self.verts = helper.table_view(self.vert_table, dts_vert)
+        self.text_verts = helper.table_view(self.text_vert_table, text_vert)
+        self.faces = helper.table_view(self.face_table, dts_mesh_face)
+        self.frames = helper.table_view(self.frame_table, dts_frame.from_row)
+
+    def frame_scales_origins(self):
+        """(F,3) float32 scale and origin per frame; mesh versions < 3 share one pair across frames."""
+        if 'scale' in self.frame_table.dtype.names:
+            return self.frame_table['scale'], self.frame_table['origin']
+        scale = np.tile(np.asarray(self.v2_scale, dtype=np.float32), (self.num_frames, 1))
+        origin = np.tile(np.asarray(self.v2_origin, dtype=np.float32), (self.num_frames, 1))
+        return scale, origin
+
+    def unpack_frames(self, frames=None):
+        """Cel animation frames as a float32 (frames, verts_per_frame, 3) array, all of them by default.
+
+        The packed uint8 positions of the frames are gathered at once and broadcast against
+        each frame's scale and origin. Vertices past the end of the table come out as the origin.
+        """
+        frames = np.arange(self.num_frames) if frames is None else np.atleast_1d(frames)
+        scale, origin = self.frame_scales_origins()
+        vert_idx = self.frame_table['first_vert'][frames].astype(np.int64)[:, None] + np.arange(self.verts_per_frame)
+        in_range = (vert_idx >= 0) & (vert_idx < self.num_verts)
+        packed = np.zeros((len(frames), self.verts_per_frame, 3), dtype=np.float32)
+        packed[in_range] = self.vert_table[vert_idx[in_range], :3]
+        return packed * scale[frames][:, None, :] + origin[frames][:, None, :]
+
+    def unpack_frame(self, frame=0):
+        """One frame's vertices as a float32 (verts_per_frame, 3) array."""
+        return self.unpack_frames([frame])[0]
+
+    def normals(self, frame=None):
+        """(V,3) float32 vertex normals gathered from the Tribes normal table with one fancy-index.
+
+        With a frame index, only that frame's verts_per_frame vertices are returned.
+        """
+        normal_indices = self.vert_table[:, 3]
+        if frame is not None:
+            first_vert = int(self.frame_table['first_vert'][frame])
+            normal_indices = normal_indices[first_vert:first_vert + self.verts_per_frame]
+        return tribes_normal.tribes_normal_array[normal_indices]
+
+
+class mesh_list:
+    """The shape's meshes, located by byte range at load time and decoded on first access."""
+    def __init__(self, view, ranges, trace=None):
+        self.view = view
+        self.ranges = ranges # (start, end) per mesh, None where no PERS block was found
+        self.loaded = [None] * len(ranges)
+        self.trace = trace or parse_trace.NO_TRACE
+
+    @classmethod
+    def from_meshes(cls, meshes):
+        """A list whose meshes are all decoded already (None where a mesh failed to parse)."""
+        instance = cls(None, [None] * len(meshes))
+        instance.loaded = list(meshes)
+        return instance
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if self.loaded[index] is None and self.ranges[index] is not None:
+            self.loaded[index] = self.decode(index)
+        return self.loaded[index]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def is_loaded(self, index):
+        return self.loaded[index] is not None
+
+    def load_all(self, workers=None):
+        """Decodes every mesh not decoded yet: serially by default, on `workers` threads when more than one.
+
+        Each mesh covers its own byte range, so they decode independently; results are stored in
+        mesh order. The threads share the file buffer and the tables stay views into it. They also
+        share the GIL, and a mesh is only a few np.frombuffer views, so threads only pay off when the
+        mesh count is large (or per-mesh work is added); on the sample shapes they are slower.
+        """
+        pending = [i for i in range(len(self)) if self.loaded[i] is None and self.ranges[i] is not None]
+        if not workers or workers <= 1 or len(pending) < 2:
+            for i in pending:
+                self[i]
+            return self
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for i, mesh_instance in zip(pending, pool.map(self.decode, pending)):
+                self.loaded[i] = mesh_instance
+        return self
+
+    def decode(self, index):
+        start, end = self.ranges[index]
+        stream = helper.binary_reader(self.view[:end], start)
+        started = time.perf_counter()
+        mesh_instance = mesh(stream)
+        # Recorded rather than begin()/end() so meshes can be decoded on several threads at once
+        self.trace.record(f'mesh[{index}]', start, stream.offset, (time.perf_counter() - started) * 1e3,
+                          count=getattr(mesh_instance, 'num_verts', None))
+        if not hasattr(mesh_instance, 'faces'): # Basic check if mesh init failed PERS check or other critical parts
+            print(f"ERROR: Mesh instance {index + 1} seems uninitialized or failed its own PERS/CelAnimMesh check.")
+        return mesh_instance
+
+
+def text_vert(u, v):
+    return (u, v)
+
+
+class dts_vert:
+    def __init__(self, packed_x, packed_y, packed_z, normal_index):
+        self.packed_x = packed_x
+        self.packed_y = packed_y
+        self.packed_z = packed_z
+        self.normal_index = normal_index
+
+    @property
+    def normal(self): # Looked up on demand; mesh.normals() gathers them all at once
+        return tribes_normal.tribes_normal_table[self.normal_index]
+
+    def get_unpacked_vert(self, scale, origin):
+        return (self.packed_x * scale[0] + origin[0],
+                self.packed_y * scale[1] + origin[1],
+                self.packed_z * scale[2] + origin[2])
+
+    def get_normal(self):
+        return self.normal
+
+class dts_mesh_face:
+    def __init__(self, vert_index0, tex_index0, vert_index1, tex_index1, vert_index2, tex_index2, mat_index):
+        self.vert_index0 = vert_index0
+        self.tex_index0 = tex_index0
+        self.vert_index1 = vert_index1
+        self.tex_index1 = tex_index1
+        self.vert_index2 = vert_index2
+        self.tex_index2 = tex_index2
+        self.mat_index = mat_index
+
+class dts_frame:
+    def __init__(self, first_vert, scale=None, origin=None):
+        self.first_vert = first_vert
+        if scale is not None:
+            self.scale = scale
+            self.origin = origin
+
+    @classmethod
+    def from_row(cls, first_vert, scale=None, origin=None):
+        """Builds a frame from a frame_table row; scale and origin only exist from mesh version 3."""
+        if scale is None:
+            return cls(first_vert)
+        return cls(first_vert, tuple(scale.tolist()), tuple(origin.tolist()))
@@ -0,0 +1,149 @@
+import functools
+
+import numpy as np
+
+from dts_module import dts_transforms
+
+
+class pose_evaluator:
+    """Evaluates every node's world matrix of a loaded dts shape for any (sequence, time).
+
+    Keyframe rotations are slerped and translations (and v7- scales) lerped between the two
+    keyframes bracketing the sequence position, for all animated nodes at once. Nodes without a
+    track in the sequence keep their default transform. Poses sampled on the frame grid are kept
+    in an LRU keyed by (sequence, frame).
+    """
+    def __init__(self, shape, transpose_rotation=False, frame_rate=30.0, cache_size=256):
+        self.shape = shape
+        self.transpose_rotation = transpose_rotation # True for player models, as in export_model
+        self.frame_rate = float(frame_rate)
+
+        nodes = shape.node_table
+        self.levels = dts_transforms.hierarchy_levels(nodes['parent_node'])
+
+        # Rest pose: each node's default transform, identity where the index is out of range
+        transform_stack = shape.get_transform_matrices(transpose_rotation, np.float64)
+        default_idx = nodes['transform_index'].astype(np.int64)
+        has_default = (default_idx >= 0) & (default_idx < len(transform_stack))
+        self.default_local = np.tile(np.eye(4), (shape.num_nodes, 1, 1))
+        self.default_local[has_default] = transform_stack[default_idx[has_default]]
+
+        self.tracks = {} # sequence -> per-sequence keyframe track arrays, see get_tracks()
+        self.frame_pose = functools.lru_cache(maxsize=cache_size)(self.compute_frame_pose)
+
+    def get_tracks(self, sequence_idx):
+        """Flattened keyframe tracks of the nodes animated by a sequence, built once per sequence."""
+        if sequence_idx in self.tracks:
+            return self.tracks[sequence_idx]
+
+        shape = self.shape
+        sub_seq_idx = shape.sub_sequence_index[:, sequence_idx]
+        track_nodes = np.nonzero(sub_seq_idx >= 0)[0]
+        sub_seqs = shape.sub_sequence_table[sub_seq_idx[track_nodes]]
+        first = sub_seqs['first_key_frame'].astype(np.int64)
+        count = np.minimum(sub_seqs['num_key_frames'].astype(np.int64), shape.num_keyframes - first)
+        keep = count > 0
+        track_nodes, first, count = track_nodes[keep], first[keep], count[keep]
+
+        # One run of keyframes per track, sorted by (track, position) for a single searchsorted
+        track_of_key = np.repeat(np.arange(len(track_nodes)), count)
+        starts = np.concatenate(([0], np.cumsum(count)[:-1])).astype(np.int64)
+        key_idx = first[track_of_key] + np.arange(len(track_of_key)) - starts[track_of_key]
+        positions = np.clip(shape.keyframe_table['position'][key_idx].astype(np.float64), 0.0, 1.0)
+        order = np.lexsort((positions, track_of_key))
+        key_idx, positions = key_idx[order], positions[order]
+
+        # Keys whose transform index is out of range fall back to the node's default transform
+        key_values = shape.keyframe_table['key_value'][key_idx].astype(np.int64)
+        key_valid = (key_values >= 0) & (key_values < shape.num_transforms)
+
+        tracks = {
+            'nodes': track_nodes,
+            'starts': starts,
+            'ends': starts + count - 1,
+            'search_keys': track_of_key[order] * 2.0 + positions, # Positions are in [0, 1]
+            'positions': positions,
+            'key_values': np.where(key_valid, key_values, 0),
+            'key_valid': key_valid,
+        }
+        self.tracks[sequence_idx] = tracks
+        return tracks
+
+    def get_position(self, sequence_idx, time):
+        """Maps a time in seconds to the sequence's normalized 0..1 keyframe position.
+
+        Cyclic sequences wrap around, the others clamp at their ends.
+        """
+        sequence = self.shape.sequence_table[sequence_idx]
+        duration = float(sequence['duration'])
+        if duration <= 0.0:
+            return 0.0
+        position = time / duration
+        if sequence['cyclic']:
+            return position % 1.0
+        return min(max(position, 0.0), 1.0)
+
+    def get_frame_count(self, sequence_idx):
+        """Number of frames sample() produces; non-cyclic sequences include their end frame."""
+        sequence = self.shape.sequence_table[sequence_idx]
+        frames = int(np.ceil(float(sequence['duration']) * self.frame_rate - 1e-6))
+        return max(1, frames if sequence['cyclic'] else frames + 1)
+
+    def local_matrices(self, sequence_idx, position):
+        """(N,4,4) float64 local node matrices at a normalized sequence position."""
+        local = self.default_local.copy()
+        if not 0 <= sequence_idx < self.shape.num_seq:
+            return local
+        tracks = self.get_tracks(sequence_idx)
+        if len(tracks['nodes']) == 0:
+            return local
+
+        # Bracketing keyframes of every track in one search
+        track_ids = np.arange(len(tracks['nodes']))
+        key0 = np.searchsorted(tracks['search_keys'], track_ids * 2.0 + position, side='right') - 1
+        key0 = np.clip(key0, tracks['starts'], tracks['ends'])
+        key1 = np.minimum(key0 + 1, tracks['ends'])
+        pos0, pos1 = tracks['positions'][key0], tracks['positions'][key1]
+        span = pos1 - pos0
+        t = np.where(span > 0.0, np.clip((position - pos0) / np.where(span > 0.0, span, 1.0), 0.0, 1.0), 0.0)
+
+        valid = tracks['key_valid'][key0] & tracks['key_valid'][key1]
+        nodes, t = tracks['nodes'][valid], t[valid]
+        idx0, idx1 = tracks['key_values'][key0[valid]], tracks['key_values'][key1[valid]]
+
+        table = self.shape.transform_table
+        q0 = dts_transforms.normalize_quat16(table['rotate'][idx0])
+        q1 = dts_transforms.normalize_quat16(table['rotate'][idx1])
+        t_col = t[:, None]
+        translate = table['translate'][idx0] * (1.0 - t_col) + table['translate'][idx1] * t_col
+        scale = None
+        if 'scale' in table.dtype.names:
+            scale = table['scale'][idx0] * (1.0 - t_col) + table['scale'][idx1] * t_col
+
+        local[nodes] = dts_transforms.compose_matrices(
+            dts_transforms.slerp(q0, q1, t), translate, scale, self.transpose_rotation)
+        return local
+
+    def world_matrices(self, sequence_idx, position):
+        """(N,4,4) float64 world node matrices at a normalized sequence position (not cached)."""
+        local = self.local_matrices(sequence_idx, position)
+        return dts_transforms.world_matrices(local, None, self.levels)
+
+    def compute_frame_pose(self, sequence_idx, frame):
+        position = self.get_position(sequence_idx, frame / self.frame_rate)
+        world = self.world_matrices(sequence_idx, position)
+        world.setflags(write=False) # Shared through the LRU
+        return world
+
+    def evaluate(self, sequence_idx, time):
+        """World matrices at `time` seconds, snapped to the nearest frame and memoized.
+
+        The returned (N,4,4) array is read-only; copy it before modifying.
+        """
+        return self.frame_pose(sequence_idx, int(round(time * self.frame_rate)))
+
+    def sample(self, sequence_idx):
+        """World matrices for every frame of a sequence as an (F,N,4,4) float64 array."""
+        return np.stack([self.frame_pose(sequence_idx, frame)
+                         for frame in range(self.get_frame_count(sequence_idx))])
+
@@ -0,0 +1,122 @@
+import numpy as np
+
+
+QUAT16_SCALE = 32767.0 # Quat16 components are stored as s2 fractions of this
+
+
+def normalize_quat16(rotate):
+    """Converts (N,4) raw Quat16 (x, y, z, w) to unit float64 quaternions.
+
+    Near-zero quaternions become the identity rotation.
+    """
+    q = np.asarray(rotate, dtype=np.float64).reshape(-1, 4) / QUAT16_SCALE
+    norms = np.sqrt((q * q).sum(axis=1))
+    degenerate = norms < 1e-6
+    q[degenerate] = (0.0, 0.0, 0.0, 1.0)
+    norms[degenerate] = 1.0
+    q /= norms[:, None]
+    return q
+
+
+def slerp(q0, q1, t):
+    """Spherical interpolation between rows of unit quaternions q0 and q1 by per-row t in [0, 1]."""
+    t = np.asarray(t, dtype=np.float64).reshape(-1, 1)
+    dot = (q0 * q1).sum(axis=1, keepdims=True)
+    q1 = np.where(dot < 0.0, -q1, q1) # Take the short way round
+    dot = np.abs(dot)
+
+    # Nearly parallel quaternions fall back to a normalized lerp
+    linear = dot > 0.9995
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.where(linear, 1.0, np.sin(theta))
+    w0 = np.where(linear, 1.0 - t, np.sin((1.0 - t) * theta) / sin_theta)
+    w1 = np.where(linear, t, np.sin(t * theta) / sin_theta)
+    q = w0 * q0 + w1 * q1
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def quats_to_rotations(q):
+    """Converts (N,4) unit quaternions (x, y, z, w) to (N,3,3) float64 rotation matrices."""
+    qx, qy, qz, qw = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+    x2, y2, z2 = qx + qx, qy + qy, qz + qz
+    xx, xy, xz = qx * x2, qx * y2, qx * z2
+    yy, yz, zz = qy * y2, qy * z2, qz * z2
+    wx, wy, wz = qw * x2, qw * y2, qw * z2
+
+    rot = np.empty((len(q), 3, 3), dtype=np.float64)
+    rot[:, 0, 0] = 1 - (yy + zz); rot[:, 0, 1] = xy - wz;       rot[:, 0, 2] = xz + wy
+    rot[:, 1, 0] = xy + wz;       rot[:, 1, 1] = 1 - (xx + zz); rot[:, 1, 2] = yz - wx
+    rot[:, 2, 0] = xz - wy;       rot[:, 2, 1] = yz + wx;       rot[:, 2, 2] = 1 - (xx + yy)
+    return rot
+
+
+def quat16_to_rotations(rotate):
+    """Converts (N,4) raw Quat16 (x, y, z, w) to (N,3,3) float64 rotation matrices."""
+    return quats_to_rotations(normalize_quat16(rotate))
+
+
+def compose_matrices(q, translate, scale=None, transpose_rotation=False, dtype=np.float64):
+    """Builds an (N,4,4) stack from unit quaternions, translations and optional per-axis scales.
+
+    The upper 3x3 is rotation * diag(scale). transpose_rotation transposes that 3x3 afterwards,
+    which is what the player models (PLAYER_MODEL_STEMS in export_model) need.
+    """
+    rot = quats_to_rotations(q)
+    if scale is not None:
+        rot = rot * np.asarray(scale, dtype=np.float64).reshape(-1, 1, 3)
+    if transpose_rotation:
+        rot = rot.transpose(0, 2, 1)
+
+    mats = np.zeros((len(rot), 4, 4), dtype=np.float64)
+    mats[:, :3, :3] = rot
+    mats[:, :3, 3] = np.asarray(translate, dtype=np.float64).reshape(-1, 3)
+    mats[:, 3, 3] = 1.0
+    return mats.astype(dtype, copy=False)
+
+
+def transform_matrices(rotate, translate, scale=None, transpose_rotation=False, dtype=np.float32):
+    """Builds an (N,4,4) stack of local node matrices from transform table columns.
+
+    rotate is (N,4) raw Quat16, translate (N,3) and scale (N,3) or None for unit scale (v8+).
+    """
+    return compose_matrices(normalize_quat16(rotate), translate, scale, transpose_rotation, dtype)
+
+
+def hierarchy_levels(parents):
+    """Groups node indices by depth so each group only depends on the groups before it.
+
+    A node is a root when its parent is -1, itself, or out of range. Nodes caught in a parent
+    cycle never reach a root and are treated as roots as well.
+    """
+    parents = np.asarray(parents, dtype=np.int64)
+    num_nodes = len(parents)
+    node_ids = np.arange(num_nodes)
+    is_root = (parents < 0) | (parents >= num_nodes) | (parents == node_ids)
+
+    depth = np.full(num_nodes, -1, dtype=np.int64)
+    depth[is_root] = 0
+    safe_parents = np.where(is_root, node_ids, parents)
+    for level in range(1, num_nodes + 1):
+        pending = depth < 0
+        ready = pending & (depth[safe_parents] == level - 1)
+        if not ready.any():
+            break
+        depth[ready] = level
+    depth[depth < 0] = 0 # Cycles
+
+    levels = [node_ids[depth == level] for level in range(depth.max() + 1)] if num_nodes else []
+    return levels, safe_parents
+
+
+def world_matrices(local, parents, levels=None):
+    """Composes (N,4,4) local node matrices down the hierarchy: world = parent_world @ local.
+
+    One batched matmul per hierarchy level. Pass `levels` from hierarchy_levels() to reuse them.
+    """
+    if levels is None:
+        levels = hierarchy_levels(parents)
+    node_levels, safe_parents = levels
+    world = np.array(local, copy=True)
+    for idx in node_levels[1:]:
+        world[idx] = world[safe_parents[idx]] @ local[idx]
+    return world
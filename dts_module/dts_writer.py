@@ -0,0 +1,369 @@
+import copy
+import struct
+
+import numpy as np
+
+from dts_module import dts_mesh
+from dts_module import dts_transforms
+
+
+# Record layouts mirroring what dts.load_binary() reads, per shape version
+OBJECT_STRUCT_V8 = struct.Struct('<hhIhH3fhh')
+OBJECT_STRUCT_V7 = struct.Struct('<HHII')     # Followed by a TMat3F and two u4 sub-sequence fields
+OBJECT_STRUCT_V6 = struct.Struct('<hhIi')     # Followed by a TMat3F and two s2 sub-sequence fields
+MAT3F_STRUCT = struct.Struct('<I9f3f')
+TRANSITION_STRUCT_V8 = struct.Struct('<IIfff4h3f')
+TRANSITION_STRUCT_V7 = struct.Struct('<IIff4h3f3f')
+TRANSITION_STRUCT_V6 = struct.Struct('<iifffffffffffff')
+DETAIL_STRUCT = struct.Struct('<If')
+FRAME_TRIGGER_STRUCT = struct.Struct('<fI')
+MATERIAL_HEAD_STRUCT = struct.Struct('<IfI4B')
+NAME_SIZE = 24
+
+
+def pers_block(class_name, body):
+    """Wraps a body in a PERS chunk: tag, chunk size, class name length, even-padded class name."""
+    name = class_name.encode('ascii')
+    padded_name = name + b'\x00' * (len(name) & 1)
+    chunk = struct.pack('<H', len(name)) + padded_name + body
+    return b'PERS' + struct.pack('<I', len(chunk)) + chunk
+
+
+def convert_table(table, dtype):
+    """Copies a structured table field by field into another version's layout.
+
+    Fields the source lacks are zero, except a missing transform scale, which is one.
+    """
+    out = np.zeros(len(table), dtype=dtype)
+    for name in dtype.names:
+        if name in table.dtype.names:
+            out[name] = table[name]
+        elif name == 'scale':
+            out[name] = 1.0
+    return out
+
+
+def mesh_to_bytes(mesh):
+    """Serializes a decoded dts_mesh.mesh as a TS::CelAnimMesh PERS block."""
+    version = mesh.version
+    header = [version, len(mesh.vert_table), mesh.verts_per_frame, len(mesh.text_vert_table),
+              len(mesh.face_table), len(mesh.frame_table)]
+    if version >= 2:
+        header.append(mesh.texture_verts_per_frame)
+    body = struct.pack(f'<{len(header)}I', *header)
+    if version < 3:
+        body += struct.pack('<6f', *mesh.v2_scale, *mesh.v2_origin)
+    body += struct.pack('<f', mesh.radius)
+
+    frame_dtype = dts_mesh.FRAME_DTYPE if version >= 3 else dts_mesh.FRAME_DTYPE_V2
+    body += np.ascontiguousarray(mesh.vert_table, dtype=dts_mesh.VERT_DTYPE).tobytes()
+    body += np.ascontiguousarray(mesh.text_vert_table, dtype=dts_mesh.TEXT_VERT_DTYPE).tobytes()
+    body += np.ascontiguousarray(mesh.face_table, dtype=dts_mesh.FACE_DTYPE).tobytes()
+    body += convert_table(mesh.frame_table, frame_dtype).tobytes()
+    return pers_block('TS::CelAnimMesh', body)
+
+
+def object_to_bytes(obj, version):
+    if version >= 8:
+        offset = obj.offset or (0.0, 0.0, 0.0)
+        return OBJECT_STRUCT_V8.pack(obj.name, obj.flags, obj.mesh_index, obj.node_index, obj.dummy, *offset,
+                                     obj.num_sub_seq, obj.first_sub_seq)
+
+    offset_rot = obj.offset_rot
+    if offset_rot is not None:
+        mat = MAT3F_STRUCT.pack(offset_rot.flags, *offset_rot.arr_3_3, *offset_rot.point)
+    else: # Identity rotation, translated by the v8 point offset if there is one
+        mat = MAT3F_STRUCT.pack(0, 1, 0, 0, 0, 1, 0, 0, 0, 1, *(obj.offset or (0.0, 0.0, 0.0)))
+    if version == 7:
+        return (OBJECT_STRUCT_V7.pack(obj.name, obj.flags, obj.mesh_index, obj.node_index) + mat +
+                struct.pack('<II', obj.num_sub_seq, obj.first_sub_seq))
+    return (OBJECT_STRUCT_V6.pack(obj.name, obj.flags, obj.mesh_index, obj.node_index) + mat +
+            struct.pack('<hh', obj.num_sub_seq, obj.first_sub_seq))
+
+
+def transition_to_bytes(transition, version):
+    rot = transition.transform_rot
+    quat = (int(rot.x), int(rot.y), int(rot.z), int(rot.w))
+    if version >= 8:
+        return TRANSITION_STRUCT_V8.pack(transition.start_seq, transition.end_seq, transition.start_pos,
+                                         transition.end_pos, transition.duration, *quat, *transition.transform_pos)
+    if version == 7:
+        return TRANSITION_STRUCT_V7.pack(transition.start_seq, transition.end_seq, transition.start_pos,
+                                         transition.end_pos, *quat, *transition.transform_pos,
+                                         *transition.transform_scale)
+    return TRANSITION_STRUCT_V6.pack(transition.start_seq, transition.end_seq, transition.start_pos, transition.end_pos,
+                                     transition.duration, rot.x, rot.y, rot.z, rot.w, *transition.transform_pos,
+                                     *transition.transform_scale)
+
+
+def material_list_to_bytes(materials, material_version, num_details=1):
+    """The trailing has-materials flag plus, when there are materials, the TS::MaterialList block."""
+    if not materials:
+        return struct.pack('<I', 0)
+    body = struct.pack('<III', material_version, num_details, len(materials))
+    map_file_size = 16 if material_version == 1 else 32
+    for material in materials:
+        body += MATERIAL_HEAD_STRUCT.pack(material.flags, material.alpha, material.internal_index,
+                                          material.rgb_r, material.rgb_g, material.rgb_b, material.rgb_flags_byte)
+        if material_version >= 1:
+            body += material.map_file.encode('utf-8')[:map_file_size - 1].ljust(map_file_size, b'\x00')
+        if material_version >= 3:
+            body += struct.pack('<Iff', material.type, material.elasticity, material.friction)
+        if material_version >= 4:
+            body += struct.pack('<I', material.use_default_props)
+    return struct.pack('<I', 1) + pers_block('TS::MaterialList', body)
+
+
+def shape_to_bytes(shape, version=None):
+    """Serializes a loaded (or assembled) dts shape to TS::Shape file bytes.
+
+    Counts come from the tables themselves, so a shape whose tables were filtered writes out
+    consistently. `version` re-encodes the tables in another layout (7 or 8); it defaults to
+    the shape's own version.
+    """
+    from dts_module.dts import table_dtypes # dts imports nothing from here; avoid a cycle at import time
+
+    version = shape.version if version is None else version
+    dtypes = table_dtypes(version)
+    meshes = list(shape.meshes) if shape.meshes is not None else []
+    objects = shape.objects or []
+    details = shape.details or []
+    transitions = shape.transitions or []
+    frame_triggers = shape.frame_trigger or []
+    names = shape.names or []
+
+    counts = [len(shape.node_table), len(shape.sequence_table), len(shape.sub_sequence_table),
+              len(shape.keyframe_table), len(shape.transform_table), len(names), len(objects),
+              len(details), len(meshes)]
+    body = struct.pack('<I', version) + struct.pack('<9I', *counts)
+    if version >= 2:
+        body += struct.pack('<I', len(transitions))
+    if version >= 4:
+        body += struct.pack('<I', len(frame_triggers))
+    body += struct.pack('<f3f', shape.radius, *shape.center)
+    if version >= 8:
+        body += struct.pack('<3f3f', *shape.min_bounds, *shape.max_bounds)
+
+    for table, kind in ((shape.node_table, 'node'), (shape.sequence_table, 'sequence'),
+                        (shape.sub_sequence_table, 'sub_sequence'), (shape.keyframe_table, 'keyframe'),
+                        (shape.transform_table, 'transform')):
+        body += convert_table(table, dtypes[kind]).tobytes()
+    for name in names:
+        body += bytes(name)[:NAME_SIZE].ljust(NAME_SIZE, b'\x00')
+    for obj in objects:
+        body += object_to_bytes(obj, version)
+    for detail in details:
+        body += DETAIL_STRUCT.pack(detail.root_node, detail.size)
+    if version >= 2:
+        for transition in transitions:
+            body += transition_to_bytes(transition, version)
+    if version >= 4:
+        for trigger in frame_triggers:
+            body += FRAME_TRIGGER_STRUCT.pack(trigger.pos, trigger.value)
+    if version >= 5:
+        body += struct.pack('<I', shape.default_materials or 0)
+    if version >= 6:
+        body += struct.pack('<i', -1 if shape.always_node is None else shape.always_node)
+
+    for mesh in meshes:
+        body += mesh_to_bytes(mesh)
+    material_version = shape.dts_version_from_material_list_pers
+    if material_version is None or material_version < 0:
+        material_version = 4
+    body += material_list_to_bytes(shape.material_list, material_version, shape.material_list_num_details or 1)
+    return pers_block('TS::Shape', body) + shape.trailing_data
+
+
+def write_shape(shape, file_name, version=None):
+    data = shape_to_bytes(shape, version)
+    with open(file_name, "wb") as file:
+        file.write(data)
+    return len(data)
+
+
+def range_mask(firsts, counts, size):
+    """Boolean mask over a table of `size` rows marking every row inside some [first, first + count)."""
+    firsts = np.asarray(firsts, dtype=np.int64)
+    counts = np.maximum(np.asarray(counts, dtype=np.int64), 0)
+    mask = np.zeros(size, dtype=bool)
+    rows = np.repeat(firsts, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    mask[rows[(rows >= 0) & (rows < size)]] = True
+    return mask
+
+
+def remap_ranges(firsts, counts, keep):
+    """(first, count) of index ranges into a table once it is compacted to the rows in `keep`.
+
+    Empty ranges are left as they were; their first index is often uninitialized in real files.
+    """
+    firsts = np.asarray(firsts, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    kept_before = np.concatenate(([0], np.cumsum(keep)))
+    lo = np.clip(firsts, 0, len(keep))
+    hi = np.clip(firsts + counts, 0, len(keep))
+    used = counts > 0
+    return np.where(used, kept_before[lo], firsts), np.where(used, kept_before[hi] - kept_before[lo], counts)
+
+
+def remap_indices(values, keep):
+    """Indices into a table after compacting it to the rows in `keep`; dropped or invalid ones become -1."""
+    new_index = np.full(len(keep), -1, dtype=np.int64)
+    new_index[keep] = np.arange(np.count_nonzero(keep))
+    values = np.asarray(values, dtype=np.int64)
+    valid = (values >= 0) & (values < len(keep))
+    return np.where(valid, new_index[np.where(valid, values, 0)], -1)
+
+
+def subtree_mask(parents, roots):
+    """Nodes that are one of `roots` or descend from one."""
+    levels, safe_parents = dts_transforms.hierarchy_levels(parents)
+    mask = np.zeros(len(parents), dtype=bool)
+    roots = np.asarray(roots, dtype=np.int64)
+    mask[roots[(roots >= 0) & (roots < len(parents))]] = True
+    for level in levels[1:]:
+        mask[level] |= mask[safe_parents[level]]
+    return mask
+
+
+def ancestor_mask(parents, nodes):
+    """Every ancestor of the given nodes (the nodes themselves excluded)."""
+    _, safe_parents = dts_transforms.hierarchy_levels(parents)
+    mask = np.zeros(len(parents), dtype=bool)
+    current = np.unique(np.asarray(nodes, dtype=np.int64))
+    while len(current):
+        parent = safe_parents[current]
+        parent = parent[(parent != current) & ~mask[parent]]
+        mask[parent] = True
+        current = np.unique(parent)
+    return mask
+
+
+def strip_shape(shape, drop_details=(), drop_sequences=(), drop_objects=()):
+    """A copy of a loaded shape with detail levels, sequences and objects removed and every table compacted.
+
+    Dropping a detail removes the nodes under its root unless a kept detail still needs them, and with
+    them their objects. Meshes, sub-sequences, keyframes, transforms, names and frame triggers nobody
+    references any more are removed as well, and all indices into them are renumbered. Any bytes that
+    trailed the input's TS::Shape block are kept as they are. The copy only carries what shape_to_bytes()
+    writes; load its bytes back for a fully indexed shape.
+    """
+    nodes, sub_seqs = shape.node_table, shape.sub_sequence_table
+    parents = nodes['parent_node'].astype(np.int64)
+    num_nodes = len(nodes)
+
+    # Nodes: drop the subtrees of removed details, but keep anything a kept detail still hangs from
+    drop_details = set(drop_details)
+    kept_details = [d for i, d in enumerate(shape.details) if i not in drop_details]
+    dropped_roots = [d.root_node for i, d in enumerate(shape.details) if i in drop_details]
+    kept_roots = [d.root_node for d in kept_details]
+    keep_node = (~subtree_mask(parents, dropped_roots) | subtree_mask(parents, kept_roots) |
+                 ancestor_mask(parents, kept_roots))
+
+    # Objects whose node is gone go with it; meshes only kept objects use are kept
+    drop_objects = set(drop_objects)
+    object_node = np.array([obj.node_index for obj in shape.objects], dtype=np.int64)
+    keep_object = np.array([i not in drop_objects for i in range(len(shape.objects))], dtype=bool)
+    on_node = (object_node >= 0) & (object_node < num_nodes)
+    keep_object[on_node] &= keep_node[object_node[on_node]]
+    object_mesh = np.array([obj.mesh_index for obj in shape.objects], dtype=np.int64)
+    keep_mesh = np.zeros(len(shape.meshes), dtype=bool)
+    used_meshes = object_mesh[keep_object]
+    keep_mesh[used_meshes[(used_meshes >= 0) & (used_meshes < len(keep_mesh))]] = True
+
+    drop_sequences = set(drop_sequences)
+    keep_sequence = np.array([i not in drop_sequences for i in range(len(shape.sequence_table))], dtype=bool)
+
+    # Sub-sequences belong to node and object ranges; keep those of kept owners in kept sequences
+    object_firsts = np.array([obj.first_sub_seq for obj in shape.objects], dtype=np.int64)
+    object_counts = np.array([obj.num_sub_seq for obj in shape.objects], dtype=np.int64)
+    node_owned = range_mask(nodes['first_sub_seq'][keep_node], nodes['num_sub_seq'][keep_node], len(sub_seqs))
+    object_owned = range_mask(object_firsts[keep_object], object_counts[keep_object], len(sub_seqs))
+    sequence_idx = sub_seqs['sequence_idx'].astype(np.int64)
+    in_kept_sequence = np.zeros(len(sub_seqs), dtype=bool)
+    valid_sequence = (sequence_idx >= 0) & (sequence_idx < len(keep_sequence))
+    in_kept_sequence[valid_sequence] = keep_sequence[sequence_idx[valid_sequence]]
+    keep_sub_seq = (node_owned | object_owned) & in_kept_sequence
+    if 'first_ifl_subsequence' in shape.sequence_table.dtype.names: # IFL sub-sequences are only listed by their sequence
+        ifl_sequences = shape.sequence_table[keep_sequence]
+        keep_sub_seq |= range_mask(ifl_sequences['first_ifl_subsequence'], ifl_sequences['num_ifl_subsequences'], len(sub_seqs))
+
+    keep_keyframe = range_mask(sub_seqs['first_key_frame'][keep_sub_seq], sub_seqs['num_key_frames'][keep_sub_seq],
+                               len(shape.keyframe_table))
+    # Node keyframes point at transforms; object keyframes (visibility and the like) keep their values
+    node_keyframe = range_mask(sub_seqs['first_key_frame'][keep_sub_seq & node_owned],
+                               sub_seqs['num_key_frames'][keep_sub_seq & node_owned], len(shape.keyframe_table))
+    transform_refs = np.concatenate((nodes['transform_index'][keep_node].astype(np.int64),
+                                     shape.keyframe_table['key_value'][keep_keyframe & node_keyframe].astype(np.int64)))
+    keep_transform = np.zeros(len(shape.transform_table), dtype=bool)
+    keep_transform[transform_refs[(transform_refs >= 0) & (transform_refs < len(keep_transform))]] = True
+
+    object_names = np.array([obj.name for obj in shape.objects], dtype=np.int64)
+    name_refs = np.concatenate((nodes['name_index'][keep_node].astype(np.int64),
+                                shape.sequence_table['name_index'][keep_sequence].astype(np.int64),
+                                object_names[keep_object]))
+    keep_name = np.zeros(len(shape.names), dtype=bool)
+    keep_name[name_refs[(name_refs >= 0) & (name_refs < len(keep_name))]] = True
+
+    sequence_table = shape.sequence_table[keep_sequence].copy()
+    keep_trigger = np.zeros(len(shape.frame_trigger), dtype=bool)
+    if 'first_trigger_frame' in sequence_table.dtype.names:
+        keep_trigger = range_mask(sequence_table['first_trigger_frame'], sequence_table['num_trigger_frames'], len(keep_trigger))
+        sequence_table['first_trigger_frame'], sequence_table['num_trigger_frames'] = remap_ranges(
+            sequence_table['first_trigger_frame'], sequence_table['num_trigger_frames'], keep_trigger)
+    if 'first_ifl_subsequence' in sequence_table.dtype.names:
+        sequence_table['first_ifl_subsequence'], sequence_table['num_ifl_subsequences'] = remap_ranges(
+            sequence_table['first_ifl_subsequence'], sequence_table['num_ifl_subsequences'], keep_sub_seq)
+    sequence_table['name_index'] = remap_indices(sequence_table['name_index'], keep_name)
+
+    node_table = nodes[keep_node].copy()
+    node_table['name_index'] = remap_indices(node_table['name_index'], keep_name)
+    node_table['parent_node'] = remap_indices(node_table['parent_node'], keep_node)
+    node_table['first_sub_seq'], node_table['num_sub_seq'] = remap_ranges(node_table['first_sub_seq'],
+                                                                          node_table['num_sub_seq'], keep_sub_seq)
+    node_table['transform_index'] = remap_indices(node_table['transform_index'], keep_transform)
+
+    sub_sequence_table = sub_seqs[keep_sub_seq].copy()
+    sub_sequence_table['sequence_idx'] = remap_indices(sub_sequence_table['sequence_idx'], keep_sequence)
+    sub_sequence_table['first_key_frame'], sub_sequence_table['num_key_frames'] = remap_ranges(
+        sub_sequence_table['first_key_frame'], sub_sequence_table['num_key_frames'], keep_keyframe)
+
+    keyframe_table = shape.keyframe_table.copy()
+    keyframe_table['key_value'][node_keyframe] = remap_indices(keyframe_table['key_value'][node_keyframe], keep_transform)
+    keyframe_table = keyframe_table[keep_keyframe]
+
+    stripped = copy.copy(shape)
+    stripped.node_table = node_table
+    stripped.sequence_table = sequence_table
+    stripped.sub_sequence_table = sub_sequence_table
+    stripped.keyframe_table = keyframe_table
+    stripped.transform_table = shape.transform_table[keep_transform].copy()
+    stripped.names = [name for name, keep in zip(shape.names, keep_name) if keep]
+    stripped.meshes = [mesh for mesh, keep in zip(shape.meshes, keep_mesh) if keep]
+
+    new_object_names = remap_indices(object_names, keep_name)
+    new_object_nodes = remap_indices(object_node, keep_node)
+    new_object_meshes = remap_indices(object_mesh, keep_mesh)
+    new_object_firsts, new_object_counts = remap_ranges(object_firsts, object_counts, keep_sub_seq)
+    stripped.objects = []
+    for i in np.flatnonzero(keep_object):
+        obj = copy.copy(shape.objects[i])
+        obj.name, obj.node_index, obj.mesh_index = int(new_object_names[i]), int(new_object_nodes[i]), int(new_object_meshes[i])
+        obj.first_sub_seq, obj.num_sub_seq = int(new_object_firsts[i]), int(new_object_counts[i])
+        stripped.objects.append(obj)
+
+    new_roots = remap_indices(kept_roots, keep_node)
+    stripped.details = [copy.copy(detail) for detail in kept_details]
+    for detail, root in zip(stripped.details, new_roots):
+        detail.root_node = int(root)
+
+    stripped.transitions = []
+    for transition in shape.transitions:
+        start_seq, end_seq = remap_indices([transition.start_seq, transition.end_seq], keep_sequence)
+        if start_seq >= 0 and end_seq >= 0:
+            transition = copy.copy(transition)
+            transition.start_seq, transition.end_seq = int(start_seq), int(end_seq)
+            stripped.transitions.append(transition)
+    stripped.frame_trigger = [trigger for trigger, keep in zip(shape.frame_trigger, keep_trigger) if keep]
+    if shape.always_node is not None and shape.always_node >= 0:
+        stripped.always_node = int(remap_indices([shape.always_node], keep_node)[0])
+    return stripped
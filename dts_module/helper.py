@@ -1,4 +1,7 @@
+import mmap
+import os
 import struct
+import numpy as np
 
 def get_int(data, byte_offset_arr):
     res = int.from_bytes(bytes=data[byte_offset_arr[0]:byte_offset_arr[0] + 4], byteorder='little')
@@ -48,6 +51,15 @@ def get_uint16(data, byte_offset_arr): # For u2le (unsigned 2-byte little-endian
     byte_offset_arr[0] += 2
     return res
 
+def map_file(file_name):
+    """Maps a whole file read-only. The pages come from the OS page cache, so every process
+    mapping the same asset shares them instead of holding its own copy of the bytes."""
+    with open(file_name, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b''  # mmap refuses empty files
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
 def get_old_int(data, byte_offset):
     return int.from_bytes(bytes=data[byte_offset:byte_offset+4], byteorder='little')
 
@@ -63,3 +75,117 @@ def get_old_float3d(data, byte_offset):
     [x, y, z] = struct.unpack('fff', data[byte_offset:byte_offset+12])
     return (x,y,z)
 
+
+_UINT32 = struct.Struct('<I')
+_INT32 = struct.Struct('<i')
+_UINT16 = struct.Struct('<H')
+_INT16 = struct.Struct('<h')
+_UINT8 = struct.Struct('<B')
+_FLOAT = struct.Struct('<f')
+_FLOAT2D = struct.Struct('<2f')
+_FLOAT3D = struct.Struct('<3f')
+
+class binary_reader:
+    """Cursor over a read-only buffer. Values are unpacked in place, nothing is sliced out of `data`."""
+    def __init__(self, data, offset=0):
+        self.view = memoryview(data).cast('B')
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.view)
+
+    def at_end(self):
+        return self.offset >= len(self.view)
+
+    def skip(self, num_bytes):
+        self.offset += num_bytes
+
+    def peek_bytes(self, num_bytes):
+        """Returns a memoryview of the next num_bytes without advancing (compares equal to bytes)."""
+        return self.view[self.offset:self.offset + num_bytes]
+
+    def read_bytes(self, num_bytes):
+        res = self.view[self.offset:self.offset + num_bytes]
+        self.offset += num_bytes
+        return res
+
+    def read_struct(self, packer):
+        res = packer.unpack_from(self.view, self.offset)
+        self.offset += packer.size
+        return res
+
+    def read_int(self):
+        [res] = _UINT32.unpack_from(self.view, self.offset)
+        self.offset += 4
+        return res
+
+    def read_sint(self):
+        [res] = _INT32.unpack_from(self.view, self.offset)
+        self.offset += 4
+        return res
+
+    def read_uint16(self):
+        [res] = _UINT16.unpack_from(self.view, self.offset)
+        self.offset += 2
+        return res
+
+    def read_int16(self):
+        [res] = _INT16.unpack_from(self.view, self.offset)
+        self.offset += 2
+        return res
+
+    def read_int8(self):
+        [res] = _UINT8.unpack_from(self.view, self.offset)
+        self.offset += 1
+        return res
+
+    def read_float(self):
+        [res] = _FLOAT.unpack_from(self.view, self.offset)
+        self.offset += 4
+        return res
+
+    def read_float2d(self):
+        res = _FLOAT2D.unpack_from(self.view, self.offset)
+        self.offset += 8
+        return res
+
+    def read_float3d(self):
+        res = _FLOAT3D.unpack_from(self.view, self.offset)
+        self.offset += 12
+        return res
+
+    def read_float_array(self, array_size):
+        res = list(struct.unpack_from(f'<{array_size}f', self.view, self.offset))
+        self.offset += 4 * array_size
+        return res
+
+    def read_array(self, dtype, count, width=None):
+        """Decodes `count` elements (rows of `width` if given) of dtype as a read-only NumPy view."""
+        num_items = count * (width or 1)
+        res = np.frombuffer(self.view, dtype=dtype, count=num_items, offset=self.offset)
+        self.offset += res.nbytes
+        if width is not None:
+            res = res.reshape(count, width)
+        return res
+
+
+class table_view:
+    """Read-only sequence over a decoded table that builds the legacy per-row object on access.
+
+    Each row is converted to Python scalars and passed to `factory` unpacked, one argument per
+    column (or per field of a structured dtype).
+    """
+    def __init__(self, table, factory):
+        self.table = table
+        self.factory = factory
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.factory(*row) for row in self.table[index].tolist()]
+        return self.factory(*self.table[index].tolist())
+
+    def __iter__(self):
+        return (self.factory(*row) for row in self.table.tolist())
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import struct
+
+import numpy as np
+
+
+CACHE_DIR_ENV = "DTS_SKINNER_CACHE" # Setting this turns caching on for the exporters
+DEFAULT_CACHE_DIR = pathlib.Path.home() / ".cache" / "dts_skinner"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+ENTRY_SUFFIX = ".npc"
+ENTRY_MAGIC = b"NPC1"
+ENTRY_HEADER = struct.Struct('<4sQ') # Magic, byte length of the JSON meta that follows
+ALIGNMENT = 64
+
+
+class parse_cache:
+    """On-disk cache of parsed shapes, keyed by file content hash, kind and parser version.
+
+    Each entry is one file: a JSON block describing the scalars, small record lists and the
+    dtype/shape/offset of every table, followed by the raw table bytes, each aligned to 64.
+    Warm loads map the file once and view the tables in place with np.frombuffer. Entries are
+    written under a temporary name and renamed into place, so readers never see a partial
+    one. Once the cache grows past max_bytes the least recently used entries are removed.
+
+    An entry that is still mapped by a loaded shape can't be replaced or deleted on Windows;
+    storing over it then just leaves the old entry, and eviction skips it for now.
+    """
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = pathlib.Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, data, kind, parser_version):
+        """Cache key for a file's bytes; bumping parser_version invalidates older entries."""
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return f"{kind}-v{parser_version}-{digest}"
+
+    def entry_path(self, key):
+        return self.cache_dir / (key + ENTRY_SUFFIX)
+
+    def load(self, key):
+        """Returns (meta, arrays) for a cached entry, or None on a miss.
+
+        The arrays are read-only views into the memory-mapped entry file.
+        """
+        path = self.entry_path(key)
+        try:
+            with open(path, "rb") as file:
+                view = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, meta_size = ENTRY_HEADER.unpack_from(view, 0)
+            if magic != ENTRY_MAGIC:
+                raise ValueError(f"Not a cache entry: {path}")
+            meta = json.loads(view[ENTRY_HEADER.size:ENTRY_HEADER.size + meta_size])
+            data_start = align(ENTRY_HEADER.size + meta_size)
+            arrays = {}
+            for name, layout in meta["arrays"].items():
+                dtype = np.lib.format.descr_to_dtype(descr_from_json(layout["descr"]))
+                count = int(np.prod(layout["shape"], dtype=np.int64))
+                array = np.frombuffer(view, dtype=dtype, count=count, offset=data_start + layout["offset"])
+                arrays[name] = array.reshape(layout["shape"])
+            os.utime(path) # Mark as recently used for eviction
+        except (OSError, ValueError, KeyError, struct.error):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return meta["data"], arrays
+
+    def store(self, key, meta, arrays):
+        """Writes an entry (a JSON-able meta dict and a name -> ndarray dict), then evicts.
+
+        Failing to write or rename the entry into place is not an error: the shape is simply
+        not cached, as if this were a miss. Returns whether the entry was stored.
+        """
+        layouts = {}
+        offset = 0
+        for name, array in arrays.items():
+            layouts[name] = {"descr": np.lib.format.dtype_to_descr(array.dtype), "shape": list(array.shape), "offset": offset}
+            offset = align(offset + array.nbytes)
+        meta_bytes = json.dumps({"arrays": layouts, "data": meta}).encode("utf-8")
+        data_start = align(ENTRY_HEADER.size + len(meta_bytes))
+
+        path = self.entry_path(key)
+        tmp_path = path.with_name(f".tmp-{os.getpid()}-{path.name}")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "wb") as file:
+                file.write(ENTRY_HEADER.pack(ENTRY_MAGIC, len(meta_bytes)))
+                file.write(meta_bytes)
+                for name, array in arrays.items():
+                    file.seek(data_start + layouts[name]["offset"])
+                    file.write(np.ascontiguousarray(array).tobytes())
+            os.replace(tmp_path, path)
+        except OSError:
+            remove(tmp_path)
+            return False
+        self.evict()
+        return True
+
+    def entries(self):
+        """(last_used, size_in_bytes, path) for every complete entry."""
+        if not self.cache_dir.is_dir():
+            return []
+        result = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(ENTRY_SUFFIX) and not entry.name.startswith(".tmp-"):
+                try:
+                    stat = entry.stat()
+                except OSError: # Removed since the scan started
+                    continue
+                result.append((stat.st_mtime, stat.st_size, pathlib.Path(entry.path)))
+        return result
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes, skipping any
+        that can't be removed right now (e.g. mapped by a loaded shape on Windows)."""
+        entries = sorted(self.entries(), key=lambda entry: entry[0])
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if remove(path):
+                total -= size
+
+    def clear(self):
+        """Removes every entry that can be removed; returns how many could not."""
+        return sum(not remove(path) for _, _, path in self.entries())
+
+
+def default_cache():
+    """The cache named by $DTS_SKINNER_CACHE, or None when caching is off."""
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    return parse_cache(cache_dir) if cache_dir else None
+
+
+def remove(path):
+    """Deletes a file if it can; False when the OS refuses (a file still mapped on Windows)."""
+    try:
+        path.unlink(missing_ok=True)
+    except OSError:
+        return False
+    return True
+
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def descr_from_json(descr):
+    """Undoes what JSON does to a dtype descr: field tuples and subarray shapes come back as lists."""
+    if isinstance(descr, str):
+        return descr
+    fields = []
+    for field in descr:
+        name, field_type = field[0], descr_from_json(field[1])
+        fields.append((name, field_type, tuple(field[2])) if len(field) > 2 else (name, field_type))
+    return fields
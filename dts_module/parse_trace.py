@@ -0,0 +1,70 @@
+import json
+import time
+
+
+class parse_trace:
+    """Opt-in record of a parse: start/end offset, element count and elapsed time per section.
+
+    Pass one to dts.load_file()/load_binary() and call to_json() afterwards. Sections are
+    opened with begin() and closed with end() in the order the parser walks the file. The
+    parser calls finish() when it is done, which fixes total_ms; lazy meshes decoded later
+    still add their sections, but not to the total.
+    """
+    def __init__(self, label=None):
+        self.label = label
+        self.sections = []
+        self.open_sections = []
+        self.created = time.perf_counter()
+        self.finished = None
+
+    def begin(self, name, stream, count=None):
+        section = {'name': name, 'start': stream.offset, 'end': None, 'count': count, 'elapsed_ms': None}
+        self.sections.append(section)
+        self.open_sections.append((section, time.perf_counter()))
+        return section
+
+    def end(self, stream, **extra):
+        section, started = self.open_sections.pop()
+        section['end'] = stream.offset
+        section['elapsed_ms'] = round((time.perf_counter() - started) * 1e3, 4)
+        section.update(extra)
+        return section
+
+    def record(self, name, start, end, elapsed_ms, count=None, **extra):
+        """Adds a section timed elsewhere, e.g. a mesh decoded on a worker thread or process."""
+        section = {'name': name, 'start': start, 'end': end, 'count': count, 'elapsed_ms': round(elapsed_ms, 4)}
+        section.update(extra)
+        self.sections.append(section)
+        return section
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def total_ms(self):
+        """Time from creating the trace to finish(), or to now while the parse is still running."""
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return round((end - self.created) * 1e3, 4)
+
+    def to_dict(self):
+        return {'label': self.label, 'total_ms': self.total_ms(), 'sections': self.sections}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+
+class null_trace:
+    """Stand-in used when tracing is off; every call is a no-op."""
+    def begin(self, name, stream, count=None):
+        return None
+
+    def end(self, stream, **extra):
+        return None
+
+    def record(self, name, start, end, elapsed_ms, count=None, **extra):
+        return None
+
+    def finish(self):
+        return None
+
+
+NO_TRACE = null_trace()
@@ -1,3 +1,5 @@
+import numpy as np
+
 tribes_normal_table = [
     (0.565061, -0.270644, -0.779396),
     (-0.309804, -0.731114, 0.607860),
@@ -255,4 +257,8 @@ tribes_normal_table = [
     (-0.660054, -0.122486, -0.741165),
     (-0.531989, 0.374711, -0.759328),
     (0.194979, -0.059120, 0.979024)
-]
\ No newline at end of file
+]
+
+# The same table as a read-only (256,3) float32 array, for gathering normals with one fancy-index
+tribes_normal_array = np.array(tribes_normal_table, dtype=np.float32)
+tribes_normal_array.setflags(write=False)
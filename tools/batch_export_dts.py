@@ -0,0 +1,127 @@
+# tools/batch_export_dts.py
+
+import sys, pathlib, argparse, glob, json, os, time, traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+project_root = pathlib.Path(__file__).resolve().parents[1]
+tools_dir = project_root / "tools"
+for path in (project_root, tools_dir):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+import export_model
+from dts_module import parse_cache
+
+DEFAULT_SOURCE_DIR = tools_dir / "dts_files"
+DEFAULT_OUTPUT_DIR = project_root / "static" / "model_json"
+
+
+def collect_dts_files(sources):
+    """Expands directories (their *.dts files, any case), globs and plain paths, de-duplicated."""
+    files = []
+    for source in sources:
+        source_path = pathlib.Path(source)
+        if source_path.is_dir():
+            matches = [p for p in source_path.iterdir() if p.is_file() and p.suffix.lower() == ".dts"]
+        elif any(c in source for c in "*?["):
+            matches = [pathlib.Path(p) for p in glob.glob(source, recursive=True)]
+        else:
+            matches = [source_path]
+        files.extend(sorted(matches))
+    seen = set()
+    return [p for p in files if not (p.resolve() in seen or seen.add(p.resolve()))]
+
+
+def export_one(dts_path, output_dir, cache_dir=None, quantize=False):
+    """Exports one file in a worker process or thread and returns its record for the report.
+
+    The exporter logs into a list of its own so parallel workers don't interleave their output.
+    """
+    cache = parse_cache.parse_cache(cache_dir) if cache_dir else parse_cache.default_cache()
+    log = []
+    start = time.perf_counter()
+    record = {"file": str(dts_path), "ok": True, "seconds": 0.0, "output": None, "error": None}
+    try:
+        exporter = export_model.shape_exporter(str(dts_path), cache, log=lambda *args: log.append(" ".join(map(str, args))),
+                                               quantize=quantize)
+        record["output"] = str(exporter.export(str(output_dir)))
+    except Exception as e:
+        record["ok"] = False
+        record["error"] = f"{type(e).__name__}: {e}"
+        record["traceback"] = traceback.format_exc()
+        record["log"] = "\n".join(log)[-4000:] # Tail only; enough to see what the exporter was doing
+    record["seconds"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def run_batch(files, output_dir, workers=None, cache_dir=None, threads=False, quantize=False):
+    """Exports every file across a process pool, or a thread pool with `threads`. Returns the summary
+    dict written as the report."""
+    output_dir = pathlib.Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = max(1, workers or os.cpu_count() or 1)
+
+    start = time.perf_counter()
+    records = []
+    if workers == 1:
+        for dts_path in files:
+            records.append(export_one(dts_path, output_dir, cache_dir, quantize))
+            print_record(records[-1])
+    else:
+        executor = ThreadPoolExecutor if threads else ProcessPoolExecutor
+        with executor(max_workers=workers) as pool:
+            futures = [pool.submit(export_one, dts_path, output_dir, cache_dir, quantize) for dts_path in files]
+            for future in as_completed(futures):
+                records.append(future.result())
+                print_record(records[-1])
+    wall_seconds = time.perf_counter() - start
+
+    records.sort(key=lambda record: record["file"])
+    failed = [record for record in records if not record["ok"]]
+    return {
+        "workers": workers,
+        "pool": "threads" if threads else "processes",
+        "files": len(records),
+        "succeeded": len(records) - len(failed),
+        "failed": len(failed),
+        "wall_seconds": round(wall_seconds, 4),
+        "cpu_seconds": round(sum(record["seconds"] for record in records), 4),
+        "results": records,
+    }
+
+
+def print_record(record):
+    status = "OK  " if record["ok"] else "FAIL"
+    detail = record["output"] if record["ok"] else record["error"]
+    print(f"[{status}] {pathlib.Path(record['file']).name:<20} {record['seconds']*1e3:>9.1f} ms  {detail}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export many DTS models to JSON in parallel.")
+    parser.add_argument("sources", nargs="*", help=f"DTS files, directories or globs (default: {DEFAULT_SOURCE_DIR})")
+    parser.add_argument("-o", "--output-dir", default=str(DEFAULT_OUTPUT_DIR), help="Directory to save the .json files")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes or threads (default: CPU count)")
+    parser.add_argument("--threads", action="store_true", help="Run the workers as threads in this process instead of separate processes")
+    parser.add_argument("--cache-dir", help=f"Cache parsed shapes here (default: ${parse_cache.CACHE_DIR_ENV}, off if unset)")
+    parser.add_argument("--quantize", action="store_true", help="Store the .bin models' positions as int16 and UVs as uint16")
+    parser.add_argument("--report", help="Write the summary report as JSON to this path")
+    args = parser.parse_args()
+
+    files = collect_dts_files(args.sources or [str(DEFAULT_SOURCE_DIR)])
+    if not files:
+        print("No DTS files found.", file=sys.stderr)
+        sys.exit(1)
+
+    summary = run_batch(files, args.output_dir, args.workers, args.cache_dir, args.threads, args.quantize)
+    print(f"\n{summary['succeeded']}/{summary['files']} exported with {summary['workers']} workers ({summary['pool']}) "
+          f"in {summary['wall_seconds']:.2f} s wall ({summary['cpu_seconds']:.2f} s summed per file).")
+    for record in summary["results"]:
+        if not record["ok"]:
+            print(f"  FAILED {record['file']}: {record['error']}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Report written to {args.report}")
+
+    sys.exit(1 if summary["failed"] else 0)
@@ -0,0 +1,82 @@
+# tools/bench_dts_load.py
+
+import sys, pathlib, argparse, time, io, contextlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))  # project root
+
+from dts_module import helper
+from dts_module import dts_mesh
+
+DEFAULT_GLOB = str(pathlib.Path(__file__).resolve().parent / "dts_files" / "*")
+MESH_CLASS_TAG = b'TS::CelAnimMesh'
+
+
+def find_mesh_offsets(data):
+    """Offsets of every CelAnimMesh PERS block, walked by chunk size from the first one."""
+    offsets = []
+    offset = data.find(MESH_CLASS_TAG) - 10 # PERS + chunk size + class name length precede the name
+    while offset >= 0 and data[offset:offset + 4] == b"PERS" and data[offset + 10:offset + 25] == MESH_CLASS_TAG:
+        offsets.append(offset)
+        offset += 8 + helper.get_old_int(data, offset + 4)
+    return offsets
+
+
+def legacy_decode(data, offset):
+    """Per-element decode as dts_mesh.mesh did it before the tables were read with np.frombuffer."""
+    idx = [offset + 26]
+    version = helper.get_int(data, idx)
+    num_verts = helper.get_int(data, idx); helper.get_int(data, idx)
+    num_tverts = helper.get_int(data, idx); num_faces = helper.get_int(data, idx)
+    num_frames = helper.get_int(data, idx)
+    if version >= 2: helper.get_int(data, idx)
+    if version < 3: idx[0] += 24
+    helper.get_float(data, idx)
+    verts = [(helper.get_int8(data, idx), helper.get_int8(data, idx), helper.get_int8(data, idx), helper.get_int8(data, idx))
+             for _ in range(num_verts)]
+    text_verts = [helper.get_float2d(data, idx) for _ in range(num_tverts)]
+    faces = [[helper.get_int(data, idx) for _ in range(7)] for _ in range(num_faces)]
+    frames = []
+    for _ in range(num_frames):
+        first_vert = helper.get_int(data, idx)
+        if version >= 3: frames.append((first_vert, helper.get_float3d(data, idx), helper.get_float3d(data, idx)))
+        else: frames.append((first_vert,))
+    return verts, text_verts, faces, frames
+
+
+def time_call(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_file(path, repeat):
+    data = pathlib.Path(path).read_bytes()
+    offsets = find_mesh_offsets(data)
+
+    def run_legacy():
+        for off in offsets: legacy_decode(data, off)
+
+    def run_numpy():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for off in offsets: dts_mesh.mesh(helper.binary_reader(data, off))
+
+    return len(offsets), time_call(run_legacy, repeat), time_call(run_numpy, repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CelAnimMesh table decoding on DTS files.")
+    parser.add_argument("paths", nargs="*", help=f"DTS files to benchmark (default: {DEFAULT_GLOB})")
+    parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions per file (best time is reported)")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(pathlib.Path(DEFAULT_GLOB).parent.glob("*"))
+    total_legacy = total_numpy = 0.0
+    print(f"{'file':<20} {'meshes':>6} {'legacy ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for path in paths:
+        num_meshes, legacy_s, numpy_s = bench_file(path, args.repeat)
+        total_legacy += legacy_s; total_numpy += numpy_s
+        print(f"{pathlib.Path(path).name:<20} {num_meshes:>6} {legacy_s*1e3:>10.3f} {numpy_s*1e3:>10.3f} {legacy_s/numpy_s:>7.1f}x")
+    if total_numpy > 0:
+        print(f"{'total':<20} {'':>6} {total_legacy*1e3:>10.3f} {total_numpy*1e3:>10.3f} {total_legacy/total_numpy:>7.1f}x")
@@ -0,0 +1,86 @@
+# tools/check_dts.py
+
+import sys, pathlib, argparse, tempfile
+
+project_root = pathlib.Path(__file__).resolve().parents[1]
+tools_dir = project_root / "tools"
+for path in (project_root, tools_dir):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from dts_module.dts import dts
+from dts_module import dts_writer
+import gen_synthetic_dts
+
+DEFAULT_SOURCE_DIR = tools_dir / "dts_files"
+
+
+def load_shape(path):
+    shape = dts()
+    shape.load_file(str(path), lazy_meshes=False)
+    return shape
+
+
+def check_probe(path):
+    """probe() must report what a full load_binary of the same file reads."""
+    shape, meta = load_shape(path), dts.probe(str(path))
+    if meta is None:
+        return ["probe() did not recognise the file"]
+    expected = {
+        "version": shape.version, "num_nodes": shape.num_nodes, "num_objects": shape.num_objects,
+        "num_meshes": shape.num_meshes, "num_keyframes": shape.num_keyframes,
+        "sequence_names": [shape.get_name(seq.name_index) for seq in shape.sequences],
+        "detail_sizes": [float(detail.size) for detail in shape.details],
+        "material_names": [mat.map_file for mat in shape.material_list],
+    }
+    return [f"{name}: probe {getattr(meta, name)!r} != load {value!r}"
+            for name, value in expected.items() if getattr(meta, name) != value]
+
+
+def check_roundtrip(path):
+    """shape_to_bytes() of an unmodified shape must give back the file it was loaded from."""
+    original = pathlib.Path(path).read_bytes()
+    data = dts_writer.shape_to_bytes(load_shape(path))
+    if data == original:
+        return []
+    if len(data) != len(original):
+        return [f"re-encoded {len(data)} bytes, file has {len(original)}"]
+    first = next(i for i, (a, b) in enumerate(zip(data, original)) if a != b)
+    return [f"re-encoded bytes differ from the file, first at offset {first}"]
+
+
+def synthetic_files(directory):
+    """Small synthetic v7 and v8 shapes, since none of the sample files are v7."""
+    paths = []
+    for version in (7, 8):
+        path = pathlib.Path(directory) / f"synthetic_v{version}.dts"
+        dts_writer.write_shape(gen_synthetic_dts.build_shape(version, num_nodes=8, num_meshes=3, num_verts=40,
+                                                             num_faces=60, num_details=2), path)
+        paths.append(path)
+    return paths
+
+
+CHECKS = {"probe": check_probe, "roundtrip": check_roundtrip}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consistency checks for the DTS parser on sample and synthetic shapes.")
+    parser.add_argument("paths", nargs="*", help=f"DTS files to check (default: {DEFAULT_SOURCE_DIR}/* and synthetic v7/v8 shapes)")
+    parser.add_argument("--check", choices=sorted(CHECKS), action="append", help="Run only these checks (default: all)")
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as temp_dir:
+        paths = [pathlib.Path(p) for p in args.paths] or sorted(DEFAULT_SOURCE_DIR.glob("*")) + synthetic_files(temp_dir)
+        for name in args.check or sorted(CHECKS):
+            for path in paths:
+                try:
+                    problems = CHECKS[name](path)
+                except Exception as e:
+                    problems = [f"{type(e).__name__}: {e}"]
+                failures += bool(problems)
+                print(f"[{'OK  ' if not problems else 'FAIL'}] {name:<10} {path.name}")
+                for problem in problems:
+                    print(f"         {problem}")
+    print(f"\n{failures} failed")
+    sys.exit(1 if failures else 0)
@@ -19,26 +19,6 @@ shape.load_file(str(disc_dts))
 
 # --- Helper Functions for LOD and Transforms ---
 
-def get_all_descendant_nodes(shape_nodes, root_node_idx_param):
-    nodes_in_lod_set = set()
-    if root_node_idx_param < 0 or root_node_idx_param >= len(shape_nodes):
-        # print(f"Warning: Invalid root_node_idx {root_node_idx_param} for get_all_descendant_nodes.")
-        return nodes_in_lod_set
-    
-    queue = [root_node_idx_param]
-    nodes_in_lod_set.add(root_node_idx_param)
-    head_ptr = 0
-    while head_ptr < len(queue):
-        current_parent_idx = queue[head_ptr]
-        head_ptr += 1
-        # Iterate through all nodes to find children of current_parent_idx
-        for i, node_obj in enumerate(shape_nodes):
-            if node_obj.parent_node == current_parent_idx and i != current_parent_idx: # Avoid self-parent loops adding indefinitely
-                if i not in nodes_in_lod_set:
-                    nodes_in_lod_set.add(i)
-                    queue.append(i)
-    return nodes_in_lod_set
-
 def get_matrix_from_quat_trans(q_tuple, t_tuple):
     qx, qy, qz, qw = q_tuple
     tx, ty, tz = t_tuple
@@ -130,7 +110,7 @@ if shape.details and shape.num_details > 0:
     
     root_node_for_lod = getattr(target_lod, 'root_node', -1)
     if root_node_for_lod != -1 and root_node_for_lod < shape.num_nodes :
-         selected_lod_nodes = get_all_descendant_nodes(shape.nodes, root_node_for_lod)
+         selected_lod_nodes = shape.get_descendant_nodes(root_node_for_lod)
          if not selected_lod_nodes : # If root node has no children and is valid, it's the only node.
              selected_lod_nodes.add(root_node_for_lod)
     else:
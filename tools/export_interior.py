@@ -20,12 +20,15 @@ if str(tools_dir) not in sys.path:
 try:
     from interior_module import interiorshape
     from interior_module import dml as interior_dml # Alias to avoid conflict if there's another dml
+    from dts_module import parse_cache
     # BitStream and huffman are used by interiorshape internally
 except ImportError as e:
     print(f"CRITICAL ERROR in export_interior.py: Failed to import from 'interior_module': {e}")
     print(f"Ensure 'interior_module' directory is in {tools_dir} and has an __init__.py.")
     raise
 
+import model_bin
+
 # --- Helper Functions ---
 def scale_offset_uv(point, scale, offset):
     return (offset[0] + (point[0] * scale[0]),
@@ -50,7 +53,7 @@ def get_matrix_from_rotation_x(angle_degrees):
     ]
 
 # --- Main Exporter Function ---
-def main(dis_file_path_str, output_json_dir_str, interior_source_dir_str, texture_source_dir_str):
+def main(dis_file_path_str, output_json_dir_str, interior_source_dir_str, texture_source_dir_str, cache=None, quantize=False): # cache: optional parse_cache.parse_cache
     dis_file_path = pathlib.Path(dis_file_path_str)
     output_json_dir = pathlib.Path(output_json_dir_str)
     interior_source_dir = pathlib.Path(interior_source_dir_str)
@@ -64,7 +67,7 @@ def main(dis_file_path_str, output_json_dir_str, interior_source_dir_str, textur
     print(f"Attempting to load DIS: {dis_file_path}")
     
     dis_obj = interiorshape.interiorshape()
-    dis_obj.load_file(str(dis_file_path))
+    dis_obj.load_file(str(dis_file_path), use_mmap=True)
 
     if not dis_obj.get_dml_list():
         raise ValueError(f"DIS file {dis_file_path.name} does not reference a DML file.")
@@ -78,7 +81,7 @@ def main(dis_file_path_str, output_json_dir_str, interior_source_dir_str, textur
 
     print(f"Loading DML: {dml_file_path}")
     dml_obj = interior_dml.dml()
-    dml_obj.load_file(str(dml_file_path))
+    dml_obj.load_file(str(dml_file_path), use_mmap=True)
 
     json_material_textures = []
     texture_dimensions_map = {}
@@ -187,7 +190,7 @@ def main(dis_file_path_str, output_json_dir_str, interior_source_dir_str, textur
         
     print(f"Processing selected DIG: {dig_file_path}")
     dig_obj = interiorshape.dig()
-    dig_obj.load_file(str(dig_file_path))
+    dig_obj.load_file(str(dig_file_path), use_mmap=True, cache=cache)
 
     for surface in dig_obj.surfaces:
         material_idx = surface.mats
@@ -265,11 +268,14 @@ def main(dis_file_path_str, output_json_dir_str, interior_source_dir_str, textur
 
     with open(output_json_path, "w") as fp:
         json.dump(json_data, fp)
+    output_bin_path = output_json_path.with_suffix(".bin")
+    bin_size = model_bin.write_model(json_data, output_bin_path, quantize)
     
     if all_vertices_flat:
         num_total_verts = len(all_vertices_flat) // 3
         num_total_tris = len(all_indices_flat) // 3
         print(f"SUCCESS: Wrote {output_json_path} (verts={num_total_verts}, tris={num_total_tris}) with {len(material_groups)} material groups.")
+        print(f"SUCCESS: Wrote {output_bin_path} ({bin_size} bytes)")
     else:
         print(f"INFO: Wrote empty/minimal JSON to {output_json_path}")
 
@@ -279,11 +285,14 @@ if __name__ == "__main__":
     parser.add_argument("output_dir", help="Directory to save the output .json file")
     parser.add_argument("interior_source_dir", help="Directory containing the .dis, .dml, and .dig files")
     parser.add_argument("texture_source_dir", help="Directory containing the .png texture files")
+    parser.add_argument("--cache-dir", help=f"Cache parsed DIG geometry here (default: ${parse_cache.CACHE_DIR_ENV}, off if unset)")
+    parser.add_argument("--quantize", action="store_true", help="Store the .bin model's positions as int16 and UVs as uint16")
     
     args = parser.parse_args()
+    cache = parse_cache.parse_cache(args.cache_dir) if args.cache_dir else parse_cache.default_cache()
     
     try:
-        main(args.dis_file, args.output_dir, args.interior_source_dir, args.texture_source_dir)
+        main(args.dis_file, args.output_dir, args.interior_source_dir, args.texture_source_dir, cache, args.quantize)
     except FileNotFoundError as e:
         print(e, file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,187 @@
+# tools/gen_synthetic_dts.py
+
+import sys, pathlib, argparse
+import numpy as np
+
+project_root = pathlib.Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from dts_module import dts_mesh
+from dts_module import dts_writer
+from dts_module.dts import dts, dts_details, dts_material_param, dts_object, table_dtypes
+
+QUAT16_ONE = 32767
+
+
+def fit(values, dtype, what):
+    """Casts index/count values to a table field's integer type, refusing ones that would wrap."""
+    values = np.asarray(values, dtype=np.int64)
+    info = np.iinfo(np.dtype(dtype))
+    if values.size and (values.min() < info.min or values.max() > info.max):
+        raise ValueError(f"{what} needs values up to {values.max()}, which does not fit this version's "
+                         f"{np.dtype(dtype)} field; use fewer nodes/sequences/keyframes or --version 7")
+    return values
+
+
+def pack_names(names):
+    return [name.encode('ascii')[:dts_writer.NAME_SIZE - 1].ljust(dts_writer.NAME_SIZE, b'\x00') for name in names]
+
+
+def node_parents(num_nodes, depth):
+    """Parent of every node: node 0 is the root and the rest hang off it as chains `depth` nodes long."""
+    parents = np.arange(-1, num_nodes - 1, dtype=np.int64)
+    parents[1::depth] = 0
+    parents[0] = -1
+    return parents
+
+
+def make_mesh(rng, num_verts, num_faces, num_frames, num_materials, extent):
+    """A CelAnimMesh of random packed vertices and faces; every frame has its own vertex block."""
+    vert_table = rng.integers(0, 256, (num_verts * num_frames, 4), dtype=np.uint8) # Any byte is a valid normal index
+    text_vert_table = rng.random((num_verts, 2), dtype=np.float32)
+    corners = rng.integers(0, num_verts, (num_faces, 3))
+    face_table = np.empty((num_faces, 7), dtype=dts_mesh.FACE_DTYPE)
+    face_table[:, 0:6:2] = corners
+    face_table[:, 1:6:2] = corners # One texture vert per vertex
+    face_table[:, 6] = rng.integers(0, max(num_materials, 1), num_faces)
+
+    frame_table = np.zeros(num_frames, dtype=dts_mesh.FRAME_DTYPE)
+    frame_table['first_vert'] = np.arange(num_frames) * num_verts
+    frame_table['scale'] = extent / 255.0
+    frame_table['origin'] = -extent / 2.0
+    header = {'version': 3, 'num_verts': len(vert_table), 'verts_per_frame': num_verts,
+              'num_texture_verts': num_verts, 'num_faces': num_faces, 'num_frames': num_frames,
+              'texture_verts_per_frame': num_verts, 'radius': float(extent * np.sqrt(3) / 2)}
+    return dts_mesh.mesh.from_tables(header, vert_table, text_vert_table, face_table, frame_table)
+
+
+def make_material(index):
+    material = dts_material_param.__new__(dts_material_param)
+    material.__dict__.update(flags=1027, alpha=0.0, internal_index=0, rgb_r=128, rgb_g=128, rgb_b=128,
+                             rgb_flags_byte=0, map_file=f"synthetic{index}.bmp", type=0, elasticity=1.0,
+                             friction=1.0, use_default_props=1)
+    return material
+
+
+def build_shape(version=8, num_nodes=16, depth=4, num_sequences=2, num_keyframes=8, num_meshes=4, num_verts=1000,
+                num_faces=2000, num_frames=1, num_materials=4, num_details=1, seed=0):
+    """Assembles an in-memory dts shape with the requested table sizes, ready for dts_writer.
+
+    Every node is animated by every sequence with num_keyframes keyframes, each pointing at its
+    own transform. Sequence 0 is named "root", so exporters pick it for the base pose.
+    """
+    if version not in (7, 8):
+        raise ValueError(f"Only v7 and v8 shapes can be generated, not v{version}")
+    num_nodes = max(num_nodes, 1)
+    depth = max(depth, 1)
+    rng = np.random.default_rng(seed)
+    dtypes = table_dtypes(version)
+    num_sub_seqs = num_nodes * num_sequences
+    spacing = 1.0
+
+    shape = dts()
+    shape.version = version
+    names = [f"node{i}" for i in range(num_nodes)]
+    names += ["root"] + [f"seq{i}" for i in range(1, num_sequences)]
+    names += [f"mesh{i}" for i in range(num_meshes)]
+    if version >= 8: # Objects store their name index as s2
+        fit(len(names) - 1, '<i2', "Object names")
+    shape.names = pack_names(names)
+    sequence_names = num_nodes
+    object_names = num_nodes + num_sequences
+
+    parents = node_parents(num_nodes, depth)
+    node_table = np.zeros(num_nodes, dtype=dtypes['node'])
+    node_table['name_index'] = fit(np.arange(num_nodes), dtypes['node']['name_index'], "Node names")
+    node_table['parent_node'] = parents
+    node_table['num_sub_seq'] = fit(np.full(num_nodes, num_sequences), dtypes['node']['num_sub_seq'], "Node sub-sequence counts")
+    node_table['first_sub_seq'] = fit(np.arange(num_nodes) * num_sequences, dtypes['node']['first_sub_seq'], "Node sub-sequence starts")
+    node_table['transform_index'] = fit(np.arange(num_nodes), dtypes['node']['transform_index'], "Node default transforms")
+    shape.node_table = node_table
+
+    sequence_table = np.zeros(num_sequences, dtype=dtypes['sequence'])
+    sequence_table['name_index'] = np.arange(num_sequences) + sequence_names
+    sequence_table['cyclic'] = 1
+    sequence_table['duration'] = num_keyframes / 30.0
+    shape.sequence_table = sequence_table
+
+    sub_sequence_table = np.zeros(num_sub_seqs, dtype=dtypes['sub_sequence'])
+    sub_seq_type = dtypes['sub_sequence']['sequence_idx']
+    sub_sequence_table['sequence_idx'] = np.tile(np.arange(num_sequences), num_nodes)
+    sub_sequence_table['num_key_frames'] = fit(np.full(num_sub_seqs, num_keyframes), sub_seq_type, "Sub-sequence keyframe counts")
+    sub_sequence_table['first_key_frame'] = fit(np.arange(num_sub_seqs) * num_keyframes, sub_seq_type, "Sub-sequence keyframe starts")
+    shape.sub_sequence_table = sub_sequence_table
+
+    num_animated = num_sub_seqs * num_keyframes
+    keyframe_table = np.zeros(num_animated, dtype=dtypes['keyframe'])
+    keyframe_table['position'] = np.tile(np.linspace(0.0, 1.0, num_keyframes, dtype=np.float32), num_sub_seqs)
+    keyframe_table['key_value'] = fit(num_nodes + np.arange(num_animated), dtypes['keyframe']['key_value'], "Keyframe transform indices")
+    shape.keyframe_table = keyframe_table
+
+    # Default pose: chains run along +Z. Animated transforms swing each node about Z over the sequence.
+    translate = np.zeros((num_nodes, 3), dtype=np.float32)
+    translate[1:, 2] = spacing
+    transform_table = np.zeros(num_nodes + num_animated, dtype=dtypes['transform'])
+    transform_table['rotate'][:, 3] = QUAT16_ONE
+    transform_table['translate'][:num_nodes] = translate
+    angles = rng.uniform(-np.pi / 4, np.pi / 4, num_animated) * np.tile(np.linspace(0.0, 1.0, num_keyframes), num_sub_seqs)
+    transform_table['rotate'][num_nodes:, 2] = np.round(np.sin(angles / 2) * QUAT16_ONE)
+    transform_table['rotate'][num_nodes:, 3] = np.round(np.cos(angles / 2) * QUAT16_ONE)
+    transform_table['translate'][num_nodes:] = np.repeat(translate, num_sequences * num_keyframes, axis=0)
+    if version == 7:
+        transform_table['scale'] = 1.0
+    shape.transform_table = transform_table
+
+    extent = spacing * min(depth, num_nodes)
+    shape.meshes = dts_mesh.mesh_list.from_meshes(
+        [make_mesh(rng, num_verts, num_faces, num_frames, num_materials, extent) for _ in range(num_meshes)])
+    # Mesh i hangs off node i, skipping the root when there are other nodes to use
+    shape.objects = [dts_object(object_names + i, 0, i, (1 + i % (num_nodes - 1)) if num_nodes > 1 else 0,
+                                None, None, (0.0, 0.0, 0.0), 0, 0)
+                     for i in range(num_meshes)]
+    shape.details = [dts_details(0, float(64 >> i)) for i in range(num_details)]
+    shape.transitions = []
+    shape.frame_trigger = []
+    shape.default_materials = 0
+    shape.always_node = -1
+
+    shape.material_list = [make_material(i) for i in range(num_materials)]
+    shape.dts_version_from_material_list_pers = 4
+    shape.material_list_num_details = max(num_details, 1)
+
+    reach = spacing * min(depth, num_nodes) + extent
+    shape.radius = float(reach * np.sqrt(3))
+    shape.center = (0.0, 0.0, 0.0)
+    shape.min_bounds = (-reach, -reach, -reach)
+    shape.max_bounds = (reach, reach, reach)
+    return shape
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic DTS shape of a chosen size, for parser and exporter benchmarks.")
+    parser.add_argument("output", help="Path of the .dts file to write")
+    parser.add_argument("--version", type=int, default=8, choices=(7, 8), help="Shape format version (default: 8)")
+    parser.add_argument("--nodes", type=int, default=16, help="Number of nodes (default: 16)")
+    parser.add_argument("--depth", type=int, default=4, help="Length of each node chain below the root (default: 4)")
+    parser.add_argument("--sequences", type=int, default=2, help="Number of sequences; each animates every node (default: 2)")
+    parser.add_argument("--keyframes", type=int, default=8, help="Keyframes per node per sequence (default: 8)")
+    parser.add_argument("--meshes", type=int, default=4, help="Number of meshes, one object each (default: 4)")
+    parser.add_argument("--verts", type=int, default=1000, help="Vertices per mesh frame (default: 1000)")
+    parser.add_argument("--faces", type=int, default=2000, help="Faces per mesh (default: 2000)")
+    parser.add_argument("--frames", type=int, default=1, help="Cel animation frames per mesh (default: 1)")
+    parser.add_argument("--materials", type=int, default=4, help="Number of materials (default: 4)")
+    parser.add_argument("--details", type=int, default=1, help="Number of detail levels (default: 1)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args()
+
+    try:
+        shape = build_shape(args.version, args.nodes, args.depth, args.sequences, args.keyframes, args.meshes,
+                            args.verts, args.faces, args.frames, args.materials, args.details, args.seed)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    size = dts_writer.write_shape(shape, args.output)
+    print(f"Wrote {args.output} ({size} bytes): v{args.version}, {args.nodes} nodes (depth {args.depth}), "
+          f"{args.sequences} sequences x {args.keyframes} keyframes, {args.meshes} meshes x "
+          f"{args.verts} verts/{args.faces} faces, {args.materials} materials")
@@ -3,6 +3,7 @@
 import sys, pathlib, argparse
 sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))  # project root
 from dts_module import dts
+from dts_module import parse_trace
 
 def get_transform_details_str(transform_idx, shape_obj):
     if 0 <= transform_idx < shape_obj.num_transforms:
@@ -32,7 +33,7 @@ def get_transform_details_str(transform_idx, shape_obj):
         return f"{q_disp} {pos_disp} {s_disp}"
     return "Invalid Transform Index"
 
-def inspect_dts_file(dts_file_path_str):
+def inspect_dts_file(dts_file_path_str, trace_parse=False, mesh_workers=None):
     dts_path = pathlib.Path(dts_file_path_str)
     if not dts_path.exists():
         print(f"Error: DTS file not found at {dts_path}")
@@ -41,12 +42,17 @@ def inspect_dts_file(dts_file_path_str):
     print(f"Inspecting DTS file: {dts_path.name}\n" + "="*30)
 
     shape = dts()
+    trace = parse_trace.parse_trace(dts_path.name) if trace_parse else None
     try:
-        shape.load_file(str(dts_path))
+        shape.load_file(str(dts_path), lazy_meshes=not trace_parse, trace=trace, mesh_workers=mesh_workers)
     except Exception as e:
         print(f"Error loading DTS file {dts_path.name}: {e}")
         return
 
+    if trace:
+        print(f"\n--- Parse Trace ---")
+        print(trace.to_json())
+
     print(f"\n--- General Info ---")
     print(f"  Version: {getattr(shape, 'version', 'N/A')}")
     print(f"  Num Nodes: {shape.num_nodes}, Seqs: {shape.num_seq}, SubSeqs: {shape.num_sub_seq}, Keyframes: {shape.num_keyframes}")
@@ -57,17 +63,11 @@ def inspect_dts_file(dts_file_path_str):
     root_sequence_idx = 0 # Default to 0
     found_root_by_name = False
     if hasattr(shape, 'sequences') and shape.sequences and hasattr(shape, 'names') and shape.names:
-        for i, seq in enumerate(shape.sequences):
-            if 0 <= seq.name_index < shape.num_names:
-                try:
-                    seq_name_bytes = shape.names[seq.name_index]
-                    seq_name = seq_name_bytes.split(b'\x00')[0].decode('utf-8', 'ignore').lower().strip()
-                    if seq_name == "root":
-                        root_sequence_idx = i
-                        found_root_by_name = True
-                        print(f"  Identified 'root' sequence at index: {root_sequence_idx}")
-                        break
-                except: pass
+        root_by_name_idx = shape.find_sequence("root")
+        if root_by_name_idx != -1:
+            root_sequence_idx = root_by_name_idx
+            found_root_by_name = True
+            print(f"  Identified 'root' sequence at index: {root_sequence_idx}")
         if not found_root_by_name and shape.num_seq > 0:
              print(f"  No sequence named 'root' found. Will use Sequence 0 for 'root' pose check.")
         elif not hasattr(shape, 'sequences') or not shape.sequences:
@@ -80,13 +80,7 @@ def inspect_dts_file(dts_file_path_str):
         # Create a mapping of node index to its name for easier parent lookup
         node_idx_to_name_map = {}
         for i, node in enumerate(shape.nodes):
-            node_name = f"UnnamedNode{i}"
-            if 0 <= node.name_index < shape.num_names:
-                try:
-                    node_name_bytes = shape.names[node.name_index]
-                    node_name = node_name_bytes.split(b'\x00')[0].decode('utf-8', 'ignore').strip()
-                except: pass
-            node_idx_to_name_map[i] = node_name
+            node_idx_to_name_map[i] = shape.get_name(node.name_index, f"UnnamedNode{i}")
         
         for i, node in enumerate(shape.nodes):
             node_name = node_idx_to_name_map.get(i, f"UnnamedNode{i}")
@@ -100,24 +94,26 @@ def inspect_dts_file(dts_file_path_str):
             
             has_root_anim = False
             if root_sequence_idx != -1: # Only check if sequences exist
-                for ss_offset in range(node.num_sub_seq):
-                    sub_seq_idx_abs = node.first_sub_seq + ss_offset
-                    if 0 <= sub_seq_idx_abs < shape.num_sub_seq:
-                        sub_seq = shape.sub_sequences[sub_seq_idx_abs]
-                        if sub_seq.sequence_idx == root_sequence_idx:
+                sub_seq_idx_abs = shape.sub_sequence_index[i, root_sequence_idx] # -1 if no keyframed track
+                if sub_seq_idx_abs >= 0:
+                    has_root_anim = True
+                    sub_seq = shape.sub_sequences[sub_seq_idx_abs]
+                    # We care about the first keyframe for the 'root' pose
+                    key_frame_idx_abs = sub_seq.first_key_frame 
+                    if 0 <= key_frame_idx_abs < shape.num_keyframes:
+                        key_frame = shape.keyframes[key_frame_idx_abs]
+                        anim_transform_idx = key_frame.key_value
+                        print(f"    'root' Seq (idx {root_sequence_idx}) Keyframe[0] Transform Idx: {anim_transform_idx} -> {get_transform_details_str(anim_transform_idx, shape)}")
+                    else:
+                        print(f"    'root' Seq SubSeq has invalid first_key_frame index: {key_frame_idx_abs}")
+                else: # The index skips sub-sequences without keyframes; still report an empty track
+                    for ss_offset in range(node.num_sub_seq):
+                        sub_seq_idx_abs = node.first_sub_seq + ss_offset
+                        if 0 <= sub_seq_idx_abs < shape.num_sub_seq and \
+                           shape.sub_sequences[sub_seq_idx_abs].sequence_idx == root_sequence_idx:
                             has_root_anim = True
-                            if sub_seq.num_key_frames > 0:
-                                # We care about the first keyframe for the 'root' pose
-                                key_frame_idx_abs = sub_seq.first_key_frame 
-                                if 0 <= key_frame_idx_abs < shape.num_keyframes:
-                                    key_frame = shape.keyframes[key_frame_idx_abs]
-                                    anim_transform_idx = key_frame.key_value
-                                    print(f"    'root' Seq (idx {root_sequence_idx}) Keyframe[0] Transform Idx: {anim_transform_idx} -> {get_transform_details_str(anim_transform_idx, shape)}")
-                                else:
-                                    print(f"    'root' Seq SubSeq has invalid first_key_frame index: {key_frame_idx_abs}")
-                            else:
-                                print(f"    'root' Seq SubSeq has 0 keyframes.")
-                            break # Found the relevant subsequence for this node and root animation
+                            print(f"    'root' Seq SubSeq has 0 keyframes.")
+                            break
             if not has_root_anim and root_sequence_idx != -1:
                 print(f"    No animation track in 'root' sequence (idx {root_sequence_idx}). Uses Default Transform for this pose.")
             elif root_sequence_idx == -1:
@@ -128,6 +124,10 @@ if __name__ == "__main__":
     import math 
     parser = argparse.ArgumentParser(description="Inspect a DTS model file, focusing on skeletal hierarchy for 'root' pose.")
     parser.add_argument("dts_file", help="Path to the .dts file to inspect (e.g., tools/dts_files/larmor.dts)")
+    parser.add_argument("--trace", action="store_true", help="Decode every mesh and print per-section parse offsets and timings as JSON")
+    parser.add_argument("--mesh-workers", type=int, default=None,
+                        help="Decode every mesh up front on this many threads (default: serially). Threads share the GIL and "
+                             "a mesh decodes in microseconds, so they only help on shapes with a large number of meshes")
     args = parser.parse_args()
 
-    inspect_dts_file(args.dts_file)
\ No newline at end of file
+    inspect_dts_file(args.dts_file, args.trace, args.mesh_workers)
\ No newline at end of file
@@ -42,11 +42,13 @@ class dml:
             if mat.index == ind:
                 return mat
 
-    def load_file(self, file):
+    def load_file(self, file, use_mmap=False):
         if file[-3:] != 'dml':
             print("Haven't implemented anything other than dml")
             return False
 
+        if use_mmap:
+            return self.load_binary(helper.map_file(file))
         with open(file, "rb") as file:
             data = file.read()
             return self.load_binary(data)
@@ -1,3 +1,5 @@
+import mmap
+import os
 import struct
 
 
@@ -96,6 +98,15 @@ def bit_read_uint(bits, bit_offset, bits_to_read):
     bit_offset[0] += bits_to_read
     return res
 
+def map_file(file_name):
+    """Maps a whole file read-only. The pages come from the OS page cache, so every process
+    mapping the same asset shares them instead of holding its own copy of the bytes."""
+    with open(file_name, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b''  # mmap refuses empty files
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
 def bit_burn(bits, bit_offset, bits_to_burn):
     bit_offset[0] += bits_to_burn
 
@@ -1,4 +1,22 @@
 from . import BitStream 
+from . import helper
+import numpy as np
+
+
+# Bump whenever parsing changes what ends up in a dig cache entry
+DIG_CACHE_VERSION = 1
+DIG_SCALAR_FIELDS = ('build_id', 'texture_scale', 'min_point', 'max_point', 'highest_mip', 'flags')
+
+# Decoded record layouts used for cache entries. BitStream.read_uint(32) unpacks as signed.
+DIG_SURFACE_DTYPE = np.dtype([('flags', 'u1'), ('mats', 'u1'), ('tsx', 'u1'), ('tsy', 'u1'), ('tox', 'u1'), ('toy', 'u1'),
+                              ('plane_id', '<u2'), ('vert_id', '<i4'), ('point_id', '<i4'),
+                              ('num_verts', 'u1'), ('num_points', 'u1')])
+DIG_BSP_NODE_DTYPE = np.dtype([('plane_id', '<i2'), ('front', '<i2'), ('back', '<i2'), ('fill', '<i2')])
+DIG_LEAF_SOLID_DTYPE = np.dtype([('surf_id', '<i4'), ('plane_id', '<i4'), ('num_surf', '<i2'), ('num_planes', '<i2')])
+DIG_LEAF_EMPTY_DTYPE = np.dtype([('flags', '<u2'), ('num_surf', '<i2'), ('pvs_id', '<i4'), ('surface_id', '<i4'),
+                                 ('plane_id', '<i4'), ('min_bounds', '<f4', (3,)), ('max_bounds', '<f4', (3,)),
+                                 ('num_planes', '<i2')])
+DIG_PLANE_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('d', '<f4')])
 
 
 class interiorshape:
@@ -12,7 +30,9 @@ class interiorshape:
         self.material_list_offset = 0
         self.linked_interior = False
 
-    def load_file(self, file_name):
+    def load_file(self, file_name, use_mmap=False):
+        if use_mmap:
+            return self.load_binary(helper.map_file(file_name))
         with open(file_name, "rb") as file:
             data = file.read()
             return self.load_binary(data)
@@ -88,11 +108,58 @@ class dig:
         self.highest_mip = 0
         self.flags = 0
 
-    def load_file(self, file_name):
-        with open(file_name, "rb") as file:
-            data = file.read()
+    def load_file(self, file_name, use_mmap=False, cache=None):
+        """Parses a DIG file. With a parse cache (dts_module.parse_cache.parse_cache) as `cache`,
+        an unchanged file is restored from its cache entry instead of being bit-parsed again."""
+        if use_mmap:
+            data = helper.map_file(file_name)
+        else:
+            with open(file_name, "rb") as file:
+                data = file.read()
+        if cache is None:
             return self.load_binary(data)
 
+        key = cache.make_key(data, 'dig', DIG_CACHE_VERSION)
+        entry = cache.load(key)
+        if entry is not None:
+            self.load_cache_entry(*entry)
+            return True
+        if not self.load_binary(data):
+            return None
+        cache.store(key, *self.cache_entry())
+        return True
+
+    def cache_entry(self):
+        """Splits the parsed geometry into a JSON-able meta dict and the arrays the cache stores."""
+        meta = {name: getattr(self, name) for name in DIG_SCALAR_FIELDS}
+        arrays = {
+            'surfaces': table_from_records(self.surfaces, DIG_SURFACE_DTYPE),
+            'bsp_nodes': table_from_records(self.bsp_nodes, DIG_BSP_NODE_DTYPE),
+            'leaves_solid': table_from_records(self.leaves_solid, DIG_LEAF_SOLID_DTYPE),
+            'leaves_empty': table_from_records(self.leaves_empty, DIG_LEAF_EMPTY_DTYPE),
+            'planes': table_from_records(self.planes, DIG_PLANE_DTYPE),
+            'pvs_bits': np.array(self.pvs_bits, dtype=np.uint8),
+            'verts': np.array(self.verts, dtype='<u2').reshape(-1, 2),
+            'points3f': np.array(self.points3f, dtype='<f4').reshape(-1, 3),
+            'points2f': np.array(self.points2f, dtype='<f4').reshape(-1, 2),
+        }
+        return meta, arrays
+
+    def load_cache_entry(self, meta, arrays):
+        """Restores the geometry from cache_entry() output."""
+        for name in DIG_SCALAR_FIELDS:
+            value = meta[name]
+            setattr(self, name, tuple(value) if isinstance(value, list) else value)
+        self.surfaces = records_from_table(dig_surface, arrays['surfaces'])
+        self.bsp_nodes = records_from_table(dig_bsp_node, arrays['bsp_nodes'])
+        self.leaves_solid = records_from_table(dig_leaf_solid, arrays['leaves_solid'])
+        self.leaves_empty = records_from_table(dig_leaf_empty, arrays['leaves_empty'])
+        self.planes = records_from_table(dig_plane, arrays['planes'])
+        self.pvs_bits = arrays['pvs_bits'].tolist()
+        self.verts = [tuple(vert) for vert in arrays['verts'].tolist()]
+        self.points3f = [tuple(point) for point in arrays['points3f'].tolist()]
+        self.points2f = [tuple(point) for point in arrays['points2f'].tolist()]
+
     def load_binary(self, data):
         return self.load_bitstream(BitStream.BitStream(data))
 
@@ -147,6 +214,29 @@ class dig:
 
         self.highest_mip = stream.read_uint(32)
         self.flags = stream.read_uint(32)
+        return True
+
+
+def table_from_records(records, dtype):
+    """Packs parsed record objects into a structured array with the given field layout."""
+    table = np.zeros(len(records), dtype=dtype)
+    for name in dtype.names:
+        table[name] = [getattr(record, name) for record in records]
+    return table
+
+
+def records_from_table(cls, table):
+    """Rebuilds record objects from a structured array without re-reading a stream."""
+    names = table.dtype.names
+    subarrays = [name for name in names if table.dtype[name].shape]
+    records = []
+    for row in table.tolist():
+        record = cls.__new__(cls)
+        record.__dict__.update(zip(names, row))
+        for name in subarrays: # Points were tuples when parsed
+            record.__dict__[name] = tuple(record.__dict__[name].tolist())
+        records.append(record)
+    return records
 
 
 class is_state:
@@ -0,0 +1,174 @@
+# tools/model_bin.py
+
+import sys, pathlib, argparse, json, struct
+import numpy as np
+
+# Layout: MAGIC, u32 FORMAT_VERSION, u32 header size, the JSON header (space padded to ALIGN bytes),
+# then the buffers it describes. Every buffer is little-endian and starts on an ALIGN boundary, so the
+# viewer can wrap it in a typed array over the fetched ArrayBuffer without copying.
+#
+# With quantize, positions are stored as normalized int16 and UVs as normalized uint16. Their buffer
+# entries then carry "normalized": true plus per-component "decode_offset" and "decode_scale", and
+# value = decode_offset + decode_scale * stored / type max (the WebGL normalized attribute value).
+MAGIC = b"DTSB"
+FORMAT_VERSION = 1
+PREAMBLE_STRUCT = struct.Struct('<4sII')
+ALIGN = 4
+
+BUFFER_DTYPES = {"float32": np.dtype('<f4'), "int16": np.dtype('<i2'), "uint16": np.dtype('<u2'), "uint32": np.dtype('<u4')}
+
+
+def index_type(vertex_count):
+    """uint16 indices whenever every vertex can be addressed with them, uint32 otherwise."""
+    return "uint16" if vertex_count <= 0x10000 else "uint32"
+
+
+def padded(size):
+    return -(-size // ALIGN) * ALIGN
+
+
+def quantize_positions(positions):
+    """Normalized int16 positions around the bounding box center, plus their decode entries.
+
+    One scale covers all three axes, so decoding is a uniform scale and a translation that the viewer
+    can put on the mesh instead of touching the vertices.
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    if not len(positions):
+        return np.zeros(0, dtype=np.int16), {"decode_offset": [0.0] * 3, "decode_scale": [1.0] * 3}
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    center = (low + high) / 2
+    scale = max(float((high - low).max()) / 2, np.finfo(np.float32).tiny)
+    quantized = np.clip(np.round((positions - center) / scale * 32767), -32767, 32767).astype(np.int16)
+    return quantized.reshape(-1), {"decode_offset": center.tolist(), "decode_scale": [scale] * 3}
+
+
+def quantize_uvs(uvs):
+    """Normalized uint16 UVs over [0, 1] (widened if they tile past it), plus their decode entries."""
+    uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+    low = np.minimum(uvs.min(axis=0), 0.0) if len(uvs) else np.zeros(2)
+    high = np.maximum(uvs.max(axis=0), 1.0) if len(uvs) else np.ones(2)
+    quantized = np.clip(np.round((uvs - low) / (high - low) * 65535), 0, 65535).astype(np.uint16)
+    return quantized.reshape(-1), {"decode_offset": low.tolist(), "decode_scale": (high - low).tolist()}
+
+
+def model_to_bytes(model, quantize=False):
+    """Encodes an exporter's model dict (vertices, uvs, indices, material_textures, groups)."""
+    positions = np.asarray(model["vertices"], dtype=BUFFER_DTYPES["float32"]).reshape(-1)
+    uvs = np.asarray(model["uvs"], dtype=BUFFER_DTYPES["float32"]).reshape(-1)
+    vertex_count = len(positions) // 3
+    indices = np.asarray(model["indices"], dtype=np.int64).reshape(-1)
+    if len(uvs) != vertex_count * 2:
+        raise ValueError(f"{len(uvs) // 2} UVs for {vertex_count} vertices")
+    if len(indices) and (indices.min() < 0 or indices.max() >= vertex_count):
+        raise ValueError(f"Index {indices.min() if indices.min() < 0 else indices.max()} out of range for {vertex_count} vertices")
+    buffers = {
+        "position": ("float32", positions, {}),
+        "uv": ("float32", uvs, {}),
+        "index": (index_type(vertex_count), indices, {}),
+    }
+    if quantize:
+        quantized, decode = quantize_positions(positions)
+        buffers["position"] = ("int16", quantized, dict(normalized=True, **decode))
+        quantized, decode = quantize_uvs(uvs)
+        buffers["uv"] = ("uint16", quantized, dict(normalized=True, **decode))
+
+    header = {
+        "vertex_count": vertex_count,
+        "index_count": len(indices),
+        "material_textures": list(model.get("material_textures") or []),
+        "groups": list(model.get("groups") or []),
+        "buffers": {},
+    }
+    # Offsets depend on the header's size, which depends on the offsets: lay out until it settles
+    header_size = 0
+    while True:
+        offset = padded(PREAMBLE_STRUCT.size + header_size)
+        for name, (type_name, values, extra) in buffers.items():
+            header["buffers"][name] = {"type": type_name, "offset": offset, "length": len(values), **extra}
+            offset += padded(len(values) * BUFFER_DTYPES[type_name].itemsize)
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        if len(header_bytes) <= header_size:
+            break
+        header_size = padded(len(header_bytes))
+    header_bytes = header_bytes.ljust(padded(PREAMBLE_STRUCT.size + header_size) - PREAMBLE_STRUCT.size, b" ")
+
+    out = bytearray(offset)
+    out[:PREAMBLE_STRUCT.size] = PREAMBLE_STRUCT.pack(MAGIC, FORMAT_VERSION, len(header_bytes))
+    out[PREAMBLE_STRUCT.size:PREAMBLE_STRUCT.size + len(header_bytes)] = header_bytes
+    for name, (type_name, values, extra) in buffers.items():
+        data = values.astype(BUFFER_DTYPES[type_name]).tobytes()
+        start = header["buffers"][name]["offset"]
+        out[start:start + len(data)] = data
+    return bytes(out)
+
+
+def write_model(model, file_name, quantize=False):
+    """Writes the binary asset for a model dict and returns its size in bytes."""
+    data = model_to_bytes(model, quantize)
+    with open(file_name, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def read_model(data):
+    """Decodes a binary asset into its header dict plus "vertices", "uvs" and "indices" arrays.
+
+    Unquantized buffers are views of `data`; quantized ones are decoded to float32 copies.
+    """
+    data = memoryview(data)
+    if len(data) < PREAMBLE_STRUCT.size:
+        raise ValueError("Not a binary model asset: too short")
+    magic, version, header_size = PREAMBLE_STRUCT.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"Not a binary model asset: magic {bytes(magic)!r}")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary model format version {version}")
+    model = json.loads(bytes(data[PREAMBLE_STRUCT.size:PREAMBLE_STRUCT.size + header_size]))
+    arrays = {}
+    for name, info in model["buffers"].items():
+        values = np.frombuffer(data, dtype=BUFFER_DTYPES[info["type"]], count=info["length"], offset=info["offset"])
+        if info.get("normalized"):
+            type_max = np.iinfo(values.dtype).max
+            normalized = np.maximum(values.reshape(-1, len(info["decode_scale"])) / type_max, -1.0)
+            values = (np.asarray(info["decode_offset"]) + np.asarray(info["decode_scale"]) * normalized).astype(np.float32).reshape(-1)
+        arrays[name] = values
+    model.update(vertices=arrays["position"], uvs=arrays["uv"], indices=arrays["index"])
+    return model
+
+
+def load_json_model(json_path):
+    """Reads an exported model JSON, including the old {'v', 'uv', 'tri'} layout, as a model dict."""
+    with open(json_path) as f:
+        data = json.load(f)
+    if "v" in data:
+        return {"vertices": data["v"], "uvs": data["uv"], "indices": data["tri"], "material_textures": [], "groups": []}
+    if "vertices" in data:
+        return data
+    raise ValueError(f"{json_path}: JSON format not recognized. Expected 'v' or 'vertices' key.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert exported model JSON files to the binary model asset format.")
+    parser.add_argument("json_files", nargs="+", help="Model .json files or directories of them")
+    parser.add_argument("-o", "--output-dir", help="Directory for the .bin files (default: next to each .json)")
+    parser.add_argument("--quantize", action="store_true", help="Store positions as int16 and UVs as uint16")
+    args = parser.parse_args()
+
+    json_paths = []
+    for source in map(pathlib.Path, args.json_files):
+        json_paths.extend(sorted(source.glob("*.json")) if source.is_dir() else [source])
+    if args.output_dir:
+        pathlib.Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    failed = 0
+    for json_path in json_paths:
+        output_dir = pathlib.Path(args.output_dir) if args.output_dir else json_path.parent
+        bin_path = output_dir / (json_path.stem + ".bin")
+        try:
+            size = write_model(load_json_model(json_path), bin_path, args.quantize)
+        except (OSError, ValueError) as e:
+            print(f"Error: {json_path}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        print(f"Wrote {bin_path}: {json_path.stat().st_size} -> {size} bytes")
+    sys.exit(1 if failed else 0)
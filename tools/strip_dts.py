@@ -0,0 +1,92 @@
+# tools/strip_dts.py
+
+import sys, pathlib, argparse
+
+project_root = pathlib.Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from dts_module.dts import dts
+from dts_module import dts_writer
+
+
+def resolve_indices(values, count, lookup, what):
+    """Turns a mix of indices and names into indices, using `lookup(name)` (-1 when unknown) for names."""
+    indices = set()
+    for value in values:
+        index = int(value) if value.lstrip("-").isdigit() else lookup(value)
+        if not 0 <= index < count:
+            raise ValueError(f"No {what} '{value}' (shape has {count})")
+        indices.add(index)
+    return indices
+
+
+def find_object(shape, name):
+    names = [shape.get_name(obj.name).lower() for obj in shape.objects]
+    return names.index(name.lower()) if name.lower() in names else -1
+
+
+def table_counts(shape):
+    return {"nodes": shape.num_nodes, "sequences": shape.num_seq, "sub_sequences": shape.num_sub_seq,
+            "keyframes": shape.num_keyframes, "transforms": shape.num_transforms, "names": shape.num_names,
+            "objects": shape.num_objects, "details": shape.num_details, "meshes": shape.num_meshes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encode a DTS shape without unwanted detail levels, sequences or objects.")
+    parser.add_argument("dts_file", help="Path to the input .dts file")
+    parser.add_argument("output", help="Path of the stripped .dts file to write")
+    parser.add_argument("--drop-details", nargs="+", default=[], help="Detail level indices to remove")
+    parser.add_argument("--max-details", type=int, help="Keep only this many of the largest detail levels")
+    parser.add_argument("--drop-sequences", nargs="+", default=[], help="Sequence names or indices to remove")
+    parser.add_argument("--keep-sequences", nargs="+", help="Keep only these sequences (names or indices)")
+    parser.add_argument("--drop-objects", nargs="+", default=[], help="Object names or indices to remove, e.g. collision meshes")
+    parser.add_argument("--version", type=int, choices=(7, 8), help="Re-encode as this shape version (default: keep)")
+    args = parser.parse_args()
+
+    shape = dts()
+    shape.load_file(args.dts_file)
+    try:
+        drop_details = resolve_indices(args.drop_details, shape.num_details, lambda name: -1, "detail")
+        if args.max_details is not None:
+            by_size = sorted(range(shape.num_details), key=lambda i: -shape.details[i].size)
+            drop_details |= set(by_size[max(args.max_details, 0):])
+        drop_sequences = resolve_indices(args.drop_sequences, shape.num_seq, shape.find_sequence, "sequence")
+        if args.keep_sequences is not None:
+            keep = resolve_indices(args.keep_sequences, shape.num_seq, shape.find_sequence, "sequence")
+            drop_sequences |= set(range(shape.num_seq)) - keep
+        drop_objects = resolve_indices(args.drop_objects, shape.num_objects, lambda name: find_object(shape, name), "object")
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    # Baseline: the unmodified input must re-encode to exactly the file, or stripping would lose more than asked
+    original = pathlib.Path(args.dts_file).read_bytes()
+    if dts_writer.shape_to_bytes(shape) != original:
+        print("Error: cannot re-encode the input losslessly; nothing written.", file=sys.stderr)
+        sys.exit(1)
+
+    stripped = dts_writer.strip_shape(shape, drop_details, drop_sequences, drop_objects)
+    data = dts_writer.shape_to_bytes(stripped, args.version)
+
+    # Load the result back and re-encode it: the parser must read everything, and nothing may move
+    reloaded = dts()
+    reloaded.load_binary(data, lazy_meshes=False)
+    if dts_writer.shape_to_bytes(reloaded) != data:
+        print("Error: stripped shape does not round-trip through the parser; nothing written.", file=sys.stderr)
+        sys.exit(1)
+    # Against the baseline: with nothing to drop the output is the input, and what stripping never touches survives
+    nothing_dropped = not (drop_details or drop_sequences or drop_objects) and args.version in (None, shape.version)
+    if (nothing_dropped and data != original) or reloaded.trailing_data != shape.trailing_data or \
+            [vars(m) for m in reloaded.material_list] != [vars(m) for m in shape.material_list]:
+        print("Error: stripped shape differs from the input beyond what was removed; nothing written.", file=sys.stderr)
+        sys.exit(1)
+    with open(args.output, "wb") as f:
+        f.write(data)
+
+    before, after = table_counts(shape), table_counts(reloaded)
+    for name in before:
+        if before[name] != after[name]:
+            print(f"  {name:<14} {before[name]:>7} -> {after[name]}")
+    original_size = pathlib.Path(args.dts_file).stat().st_size
+    print(f"Wrote {args.output}: {original_size} -> {len(data)} bytes ({100.0 * len(data) / max(original_size, 1):.1f}%)")